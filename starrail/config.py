@@ -1,15 +1,31 @@
 import json
 import os
+import threading
+from contextlib import contextmanager
 
 from easydict import EasyDict
 
+from starrail.utils.misc import atomic_write
+
 userroot = os.path.abspath(os.path.expanduser('~'))
 srroot = os.path.join(userroot, '.starrail')
 
 
 class Configuration(EasyDict):
+    """
+    The configuration, whose user keys are saved to `config_path` when they
+    are changed. Changes made within `deferred_flush()` or `update_many()`
+    are saved at once. When saving, the keys changed in the file by another
+    process since it was last read or written are adopted, unless they were
+    changed here too.
+    """
 
     def __init__(self, d=None, **kwargs):
+        # bookkeeping kept out of the dictionary, see EasyDict.__setattr__
+        object.__setattr__(self, 'lock', threading.RLock())
+        object.__setattr__(self, 'dirty_keys', set())
+        object.__setattr__(self, 'defer_depth', 0)
+        object.__setattr__(self, 'file_stat', None)
         self.no_flush = True
         self.skip_keys = set()
         self.user_keys = set(kwargs.keys())
@@ -19,23 +35,96 @@ class Configuration(EasyDict):
     def set_skip_keys(self, *args: str):
         self.skip_keys |= set(args)
 
+    def is_saved_key(self, name):
+        return name in self.user_keys and name not in self.skip_keys
+
     def __setattr__(self, name, value):
-        super().__setattr__(name, value)
-        if (
-            not self.no_flush
-            and name in self.user_keys
-            and name not in self.skip_keys
-        ):
-            self.flush()
+        if getattr(self, 'no_flush', True) or not self.is_saved_key(name):
+            super().__setattr__(name, value)
+            return
+        with self.lock:
+            if name in self and self[name] == value:
+                return
+            super().__setattr__(name, value)
+            self.dirty_keys.add(name)
+            if not self.defer_depth:
+                self.flush()
+
+    @contextmanager
+    def deferred_flush(self):
+        """
+        Defers saving the keys set within the context, which are saved at
+        once when the outermost context exits.
+        """
+
+        with self.lock:
+            object.__setattr__(self, 'defer_depth', self.defer_depth + 1)
+            try:
+                yield self
+            finally:
+                object.__setattr__(self, 'defer_depth', self.defer_depth - 1)
+                if not self.defer_depth and self.dirty_keys:
+                    self.flush()
+
+    def update_many(self, d=None, **kwargs):
+        """
+        Sets many keys, and saves them with a single write.
+        """
+
+        with self.deferred_flush():
+            self.update(d, **kwargs)
+
+    def stat_file(self):
+        try:
+            stat = os.stat(self.config_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def load(self):
+        """
+        Reads the user keys from `config_path`, without saving them back.
+        """
+
+        with self.lock:
+            with open(self.config_path, encoding='utf-8') as fcfg:
+                custom_config = json.load(fcfg)
+            object.__setattr__(self, 'file_stat', self.stat_file())
+            self.no_flush = True
+            try:
+                self.update(custom_config)
+            finally:
+                self.no_flush = False
 
     def flush(self):
-        if not self.no_flush:
+        if self.no_flush:
+            return
+        with self.lock:
+            on_disk = dict()
+            if self.file_stat is not None and self.stat_file() not in (
+                None, self.file_stat,
+            ):
+                try:
+                    with open(self.config_path, encoding='utf-8') as fcfg:
+                        on_disk = json.load(fcfg)
+                except (OSError, ValueError):
+                    on_disk = dict()
+            self.no_flush = True
+            try:
+                # edits of other processes win over unchanged keys only
+                for k, v in on_disk.items():
+                    if self.is_saved_key(k) and k not in self.dirty_keys:
+                        setattr(self, k, v)
+            finally:
+                self.no_flush = False
             cfg = {
                 k: self[k]
                 for k in self.user_keys if k not in self.skip_keys
             }
-            with open(self.config_path, 'w', encoding='utf-8') as fcfg:
-                json.dump(cfg, fcfg, indent=2)
+            os.makedirs(os.path.dirname(self.config_path), exist_ok=True)
+            atomic_write(self.config_path, json.dumps(cfg, indent=2))
+            object.__setattr__(self, 'file_stat', self.stat_file())
+            self.dirty_keys.clear()
 
 
 configuration = Configuration(
@@ -43,16 +132,28 @@ configuration = Configuration(
     db_dir=os.path.join(srroot, 'database'),
     config_path=os.path.join(srroot, 'config.json'),
     account_record_path=os.path.join(srroot, 'accounts.json'),
+    account_db_path=os.path.join(srroot, 'accounts.sqlite3'),
     res_cache_dir=os.path.join(srroot, 'cache'),
     user_info_dir=os.path.join(srroot, 'userinfo'),
+    device_fp_cache_path=os.path.join(srroot, 'device_fp.json'),
     check_update=True,
     locale='zhs',
     log_level='DEBUG',
+    http_pool_size=10,
+    http_max_retries=3,
+    http_backoff_factor=0.5,
+    http_timeout=10.0,
+    res_cache_max_size=256 * 1024 * 1024,
+    device_fp_expires=24 * 3600.0,
+    account_backend='json',
+    scheduler_workers=4,
+    banner_workers=2,
 )
 configuration.set_skip_keys(
     'skip_keys', 'no_flush',
     'cache_dir', 'config_path', 'db_dir', 'account_record_path',
-    'res_cache_dir', 'user_info_dir',
+    'account_db_path',
+    'res_cache_dir', 'user_info_dir', 'device_fp_cache_path',
 )
 
 
@@ -64,9 +165,6 @@ def init_config():
     os.makedirs(configuration.user_info_dir, exist_ok=True)
 
     if os.path.isfile(configuration.config_path):
-        with open(configuration.config_path, encoding='utf-8') as fcfg:
-            custom_config = json.load(fcfg)
-
-        configuration.update(custom_config)
+        configuration.load()
     else:
         configuration.flush()
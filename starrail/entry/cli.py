@@ -3,11 +3,8 @@ import traceback
 
 from starrail import __version__, digital_version
 from starrail.config import configuration as cfg
-from starrail.entry.setup import setup
-from starrail.gacha.service import export_gacha_from_api, import_srgf_data
-from starrail.unlock.service import unlock_fps
+from starrail.entry.setup import setup, welcome
 from starrail.utils import babelfish, loggings
-from starrail.utils.auto_update import check_update
 
 logger = loggings.get_logger(__file__)
 
@@ -38,6 +35,13 @@ def get_parser() -> argparse.ArgumentParser:
         '--api', type=str,
         help='URL of the gacha api, please refer to README.md for details.',
     )
+    gacha.add_argument(
+        '--game-dir', type=str,
+        help=(
+            'Game directory (containing StarRail_Data) to detect the api URL '
+            'from, on any platform.'
+        ),
+    )
     gacha.add_argument(
         '--export', nargs='+', type=str, default=['all'],
         choices=['all', 'csv', 'html', 'json', 'md', 'srgf', 'xlsx'],
@@ -51,6 +55,40 @@ def get_parser() -> argparse.ArgumentParser:
         '--request-interval', type=float, default=0.1,
         help='Minimum interval (seconds) between two requests.',
     )
+    gacha.add_argument(
+        '--full', action='store_true',
+        help=(
+            'Download the whole gacha history instead of stopping at the '
+            'newest cached record.'
+        ),
+    )
+    gacha.add_argument(
+        '--compact', action='store_true',
+        help='Write json and srgf exports without indentation.',
+    )
+    gacha.add_argument(
+        '--export-backend', type=str, default='native',
+        choices=['native', 'pandas'],
+        help='Library used to write csv and xlsx exports.',
+    )
+    gacha.add_argument(
+        '--parallel-export', action='store_true',
+        help='Write the export formats in parallel threads.',
+    )
+
+    gacha_subparsers = gacha.add_subparsers(dest='gacha_command')
+    sync_all = gacha_subparsers.add_parser(
+        'sync-all',
+        help='Synchronize several accounts concurrently.',
+    )
+    sync_all.add_argument(
+        '--api-file', type=str, required=True,
+        help='Text file of gacha api URLs, one for each account per line.',
+    )
+    sync_all.add_argument(
+        '--workers', type=int, default=4,
+        help='Number of accounts synchronized concurrently.',
+    )
 
     unlock = subparsers.add_parser('unlock')
     unlock.add_argument(
@@ -68,6 +106,9 @@ def get_parser() -> argparse.ArgumentParser:
 def cli_check_update():
     if cfg.check_update:
         try:
+            # requests is only imported when the update is checked
+            from starrail.utils.auto_update import check_update
+
             latest = check_update()
             logger.info('Check Update:')
             logger.info(f' * Current version is {__version__}')
@@ -91,6 +132,7 @@ def cli_check_update():
 
 
 def cli_entry():
+    welcome()
     parser = get_parser()
     args = parser.parse_args()
     setup(log_level=args.log_level, locale=args.locale)
@@ -98,14 +140,36 @@ def cli_entry():
     logger.info(cfg)
     cli_check_update()
 
-    if args.command == 'gacha':
+    # services are imported on demand, so each command only loads the
+    # dependencies it uses
+    if args.command == 'gacha' and args.gacha_command == 'sync-all':
+        from starrail.gacha.service import sync_all_from_api
+
+        sync_all_from_api(
+            api_file=args.api_file,
+            workers=args.workers,
+            request_interval=args.request_interval,
+            incremental=not args.full,
+        )
+    elif args.command == 'gacha':
+        from starrail.gacha.service import (
+            export_gacha_from_api, import_srgf_data,
+        )
+
         import_srgf_data(filename=args.load)
         export_gacha_from_api(
             api_url=args.api,
+            game_dir=args.game_dir,
             export=args.export,
             request_interval=args.request_interval,
+            incremental=not args.full,
+            compact=args.compact,
+            backend=args.export_backend,
+            parallel=args.parallel_export,
         )
     elif args.command == 'unlock':
+        from starrail.unlock.service import unlock_fps
+
         unlock_fps(fps=args.fps, reset=args.reset)
     else:
         parser.print_help()
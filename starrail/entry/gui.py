@@ -1,8 +1,9 @@
 import sys
 
 from starrail.config import configuration as cfg
-from starrail.entry.setup import setup
+from starrail.entry.setup import setup, welcome
 from starrail.utils import loggings
+from starrail.utils.schedule import get_scheduler
 
 logger = loggings.get_logger(__file__)
 
@@ -23,11 +24,14 @@ except ImportError as e:
 
 
 def gui_entry():
+    welcome()
     setup(log_level=cfg.log_level, locale=qcfg.locale.value.value.name())
 
     AA = Qt.ApplicationAttribute
     app = QApplication(sys.argv)
     app.setAttribute(AA.AA_DontCreateNativeWidgetSiblings)
+    # pending jobs are dropped, and the running ones end with their timeouts
+    app.aboutToQuit.connect(lambda: get_scheduler().shutdown(wait=False))
 
     window = StarRailToolkit()
     window.show()
@@ -9,6 +9,20 @@ from starrail.utils.loggings import get_logger, setup_logging
 logger = get_logger(__file__)
 
 
+def welcome():
+    print('+--------------------------------------+')
+    print('|      Honkai: Star Rail Toolkit       |')
+    print('|      ^^^^^^^^^^^^^^^^^^^^^^^^^       |')
+    print('|         author: LittleNyima          |')
+    print('+--------------------------------------+')
+    print(
+        'NOTICE: This software is licensed under the GNU General Public\n'
+        'License v3.0 and SHALL NOT be used for commercial purpose. All\n'
+        'rights reserved to LittleNyima. Please contact me if the project\n'
+        'has any potential infringement risks.',
+    )
+
+
 def display_platform_info():
     logger.info(f'PLATFORM:     {platform.platform()}')
     logger.info(f'VERSION:      {platform.version()}')
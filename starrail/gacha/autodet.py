@@ -1,8 +1,12 @@
 import configparser
+import functools
+import mmap
 import os
 import platform
 import re
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Iterator
 from urllib.parse import parse_qsl, urlparse
 
 from starrail.utils import loggings
@@ -14,7 +18,10 @@ logger = loggings.get_logger(__file__)
 reg_key_prefix = 'SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Uninstall\\'
 reg_key_cn = reg_key_prefix + '崩坏：星穹铁道'
 # reg_key_os = reg_key_prefix + 'Star Rail'
-api_pattern = re.compile(r'https://.+/api/getGachaLog.+game_biz=hkrpg.+')
+# urls are runs of printable ascii characters in the binary cache file
+api_pattern = re.compile(
+    rb'https://[!-~]+?/api/getGachaLog[!-~]*?game_biz=hkrpg[!-~]*',
+)
 
 
 def detect_game_install_path():
@@ -35,48 +42,41 @@ def detect_game_install_path():
     return game_install_path
 
 
-def get_legacy_cache_path(game_install_path):
-    logger.info('Getting legacy gacha query cache path')
-    cache_path = os.path.join(
-        game_install_path, 'StarRail_Data', 'webCaches',
-        'Cache', 'Cache_Data', 'data_2',
-    )
-    if not os.path.exists(cache_path):
-        error_msg = (
-            f'Cache path {cache_path} is not existing. Please visit '
-            'the gacha querying page before exporting gacha data.'
-        )
-        logger.error(error_msg)
-    return cache_path
-
-
-def get_cache_path(game_install_path):
-    logger.info('Getting gacha query cache path')
+def get_versioned_cache_dirs(game_install_path):
+    # versioned cache folders, sorted from the oldest to the newest version
     base_cache_path = os.path.join(
         game_install_path, 'StarRail_Data', 'webCaches',
     )
+    if not os.path.isdir(base_cache_path):
+        return []
     versions = []
     pattern = re.compile(r'[\d.]+$')
     for subdir in os.listdir(base_cache_path):
         path = os.path.join(base_cache_path, subdir)
         if os.path.isdir(path) and re.match(pattern, subdir):
             versions.append(subdir)
-    if not versions:
-        return get_legacy_cache_path(game_install_path)
-    versions.sort(key=lambda x: tuple(map(int, x.split('.'))))
-    latest_version = versions[-1]
-    return os.path.join(
-        base_cache_path, latest_version, 'Cache', 'Cache_Data', 'data_2',
+    versions.sort(
+        key=lambda x: tuple(int(it) for it in x.split('.') if it),
     )
+    return [os.path.join(base_cache_path, version) for version in versions]
 
 
-def get_url_from_text(text):
-    if not text:
-        return None
-    urls = re.findall(api_pattern, text)
-    if not urls:
-        return None
-    return urls[-1]
+def get_cache_paths(game_install_path):
+    """
+    Lists the existing cache files of all the versioned cache folders and
+    of the legacy cache folder, from the oldest to the newest.
+    """
+
+    logger.info('Getting gacha query cache paths')
+    cache_dirs = get_versioned_cache_dirs(game_install_path)
+    cache_dirs.insert(
+        0, os.path.join(game_install_path, 'StarRail_Data', 'webCaches'),
+    )
+    cache_paths = [
+        os.path.join(cache_dir, 'Cache', 'Cache_Data', 'data_2')
+        for cache_dir in cache_dirs
+    ]
+    return list(filter(os.path.isfile, cache_paths))
 
 
 def safe_int(value, default_value=0):
@@ -93,21 +93,83 @@ def get_timestamp_from_url(url):
     return safe_int(timestamp)
 
 
-def get_latest_url(url_list):
-    timestamp_list = list(map(get_timestamp_from_url, url_list))
-    max_timestamp = max(timestamp_list)
-    max_index = [
-        idx for idx, timestamp in enumerate(timestamp_list)
-        if timestamp == max_timestamp
-    ]
-    return url_list[max_index[-1]]
+def rank_api_urls(url_list):
+    """
+    Sorts api URLs from the newest to the oldest by their `timestamp` query
+    parameter, URLs found later come first among those of the same
+    timestamp. Duplicates are removed.
+    """
+
+    ranked = sorted(
+        enumerate(url_list),
+        key=lambda it: (get_timestamp_from_url(it[1]), it[0]),
+        reverse=True,
+    )
+    return list(dict.fromkeys(url for _, url in ranked))
+
+
+def scan_chunks(
+    fp: BinaryIO,
+    chunk_size: int = 1 << 22,
+    overlap: int = 1 << 16,
+) -> Iterator[str]:
+    """
+    Finds api URLs in a binary stream read in chunks. Consecutive chunks
+    overlap by `overlap` bytes so that URLs crossing a chunk boundary are
+    found as well, provided that they are shorter than `overlap`.
+    """
+
+    buffer = b''
+    skip = 0  # matches before this position have been yielded already
+    while True:
+        data = fp.read(chunk_size)
+        buffer += data
+        eof = not data
+        # matches starting in the overlap are left to the next chunk
+        limit = len(buffer) if eof else max(len(buffer) - overlap, 0)
+        last_end = 0
+        for match in api_pattern.finditer(buffer, skip):
+            if match.start() >= limit:
+                break
+            yield match.group().decode('ascii')
+            last_end = match.end()
+        if eof:
+            return
+        retained = min(overlap, len(buffer))
+        skip = max(last_end - (len(buffer) - retained), 0)
+        buffer = buffer[-retained:]
+
+
+def scan_cache_file(cache_path: str) -> Iterator[str]:
+    """
+    Finds api URLs in a cache file. The file is memory-mapped so that it is
+    searched without being loaded into memory, and only matched URLs are
+    decoded. Files that cannot be mapped are read in overlapping chunks.
+    """
+
+    with open(cache_path, 'rb') as f_cache:
+        try:
+            cache = mmap.mmap(f_cache.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):  # e.g. empty or locked files
+            yield from scan_chunks(f_cache)
+            return
+        with cache:
+            for match in api_pattern.finditer(cache):
+                yield match.group().decode('ascii')
+
+
+@functools.lru_cache
+def robocopy_available():
+    if platform.system() != 'Windows':
+        return False
+    return os.system('where robocopy') == 0
 
 
 # Modified from: https://github.com/sunfkny/genshin-gacha-export
 # (under MIT license)
-def get_api_from_cache(cache_path):
-    logger.info('Getting api URL from cache')
-    if os.system('where robocopy') == 0:  # robocopy is available
+def read_api_urls(cache_path):
+    if robocopy_available():
+        # the cache file is locked while the game is running
         with tempfile.TemporaryDirectory() as tmpdir:
             src_dir = os.path.dirname(cache_path)
             basename = os.path.basename(cache_path)
@@ -115,41 +177,77 @@ def get_api_from_cache(cache_path):
             cmd = f'robocopy "{src_dir}" "{tmpdir}" "{basename}" 2>&1'
             msg = os.popen(cmd, 'r').read()
             if os.path.isfile(tgt_path):
-                with open(tgt_path, 'rb') as f_cache:
-                    cache = f_cache.read()
-            else:
-                logger.error(
-                    'Fail to copy cache file with robocopy. Please try to '
-                    'stop the game and run this command again. This is the '
-                    'output of robocopy:\n'
-                    f'{msg}',
-                )
-                return ''
-    else:  # robocopy is unavailable, read the original file
-        with open(cache_path, 'rb') as f_cache:
-            cache = f_cache.read()
-    parts = cache.split(b'1/0/')
-    parts = [part.split(b'\x00')[0].decode(errors='ignore') for part in parts]
-    parts = map(get_url_from_text, parts)
-    parts = list(filter(bool, parts))
-    if not parts:
-        error_msg = (
+                return list(scan_cache_file(tgt_path))
+            logger.error(
+                'Fail to copy cache file with robocopy. Please try to '
+                'stop the game and run this command again. This is the '
+                'output of robocopy:\n'
+                f'{msg}',
+            )
+            return []
+    # robocopy is unavailable, read the original file
+    return list(scan_cache_file(cache_path))
+
+
+def get_api_from_game_dir(game_install_path):
+    """
+    Finds the newest api URL in all the cache folders of a game directory.
+    The cache files are scanned in parallel and the URLs found are ranked by
+    their timestamps.
+
+    Args:
+        game_install_path (str): The game directory, which contains the
+            `StarRail_Data` folder.
+
+    Returns:
+        str: The newest api URL, or an empty string if none is found.
+    """
+
+    cache_paths = get_cache_paths(game_install_path)
+    if not cache_paths:
+        logger.error(
+            f'No cache file is found in {game_install_path}. Please check '
+            'the game directory and visit the gacha querying page before '
+            'exporting gacha data.',
+        )
+        return ''
+    logger.info(f'Scanning {len(cache_paths)} cache files for api URL')
+    robocopy_available()  # checked once before the threads start
+    with ThreadPoolExecutor(max_workers=len(cache_paths)) as executor:
+        url_lists = list(executor.map(read_api_urls, cache_paths))
+    # cache files are ordered from the oldest to the newest version, so
+    # URLs of newer versions win ties
+    urls = rank_api_urls([url for it in url_lists for url in it])
+    if not urls:
+        logger.error(
             'API URL is not found in cache. Please visit the gacha querying '
-            'page before exporting gacha data.'
+            'page before exporting gacha data.',
         )
-        logger.error(error_msg)
         return ''
-    return get_latest_url(parts)
+    logger.info(
+        f'Found {len(urls)} api URLs, using the one with timestamp '
+        f'{get_timestamp_from_url(urls[0])}',
+    )
+    return urls[0]
+
 
+def detect_api_url(game_dir=None):
+    """
+    Detects the api URL from the web caches of the game. The game directory
+    is read from the registry if it is not given, which is only supported
+    on Windows.
+    """
 
-def detect_api_url():
+    if game_dir:
+        logger.info(f'Trying to auto-detecting API URL from {game_dir}')
+        return get_api_from_game_dir(game_dir)
     if platform.system() == 'Windows':
         logger.info('Trying to auto-detecting API URL')
         game_install_path = detect_game_install_path()
-        cache_path = get_cache_path(game_install_path)
-        return get_api_from_cache(cache_path)
+        return get_api_from_game_dir(game_install_path)
     else:
         logger.error(
             'Auto-detect API URL is only supported on Windows '
-            'platform, aborting.',
+            'platform, aborting. Please specify the game directory or '
+            'the API URL instead.',
         )
@@ -1,11 +1,45 @@
+import calendar
+import contextlib
+import datetime
+import functools
 import sqlite3
-from typing import Dict, List, Tuple
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
 from starrail.gacha.type import GachaType
 from starrail.utils import loggings
 
 logger = loggings.get_logger(__file__)
 
+TIME_FMT = '%Y-%m-%d %H:%M:%S'
+
+
+def timezone_offset(region_time_zone: str) -> int:
+    try:
+        return int(region_time_zone) * 3600
+    except (TypeError, ValueError):
+        return 0
+
+
+def parse_time(timestr: str, region_time_zone: str) -> int:
+    """
+    Converts a record time, which is the local time of the region, into an
+    epoch timestamp.
+    """
+
+    timestruct = datetime.datetime.fromisoformat(timestr).timetuple()
+    return calendar.timegm(timestruct) - timezone_offset(region_time_zone)
+
+
+@functools.lru_cache(maxsize=4096)  # records of a ten-pull share the time
+def format_time(epoch: int, region_time_zone: str) -> str:
+    """
+    Converts an epoch timestamp back into the local time of the region.
+    """
+
+    timestruct = time.gmtime(epoch + timezone_offset(region_time_zone))
+    return time.strftime(TIME_FMT, timestruct)
+
 
 class GachaDatabase:
     def __init__(self, db_name: str) -> None:
@@ -41,6 +75,30 @@ class GachaDatabase:
         logger.info(f'Call update from external package: {sql}; {parameters}')
         self.__exec_update(sql, parameters)
 
+    @contextlib.contextmanager
+    def transaction(self, immediate: bool = False):
+        """
+        Runs the statements executed inside the context in one transaction,
+        which is committed on exit or rolled back if an exception is raised.
+
+        Args:
+            immediate: Whether to take the write lock of the database when the
+                transaction begins, so that what is read inside it cannot be
+                changed by another connection before it is committed.
+
+        Yields:
+            The cursor of the database connection.
+        """
+
+        self.cursor.execute('BEGIN IMMEDIATE;' if immediate else 'BEGIN;')
+        try:
+            yield self.cursor
+        except BaseException:
+            self.conn.rollback()
+            raise
+        else:
+            self.conn.commit()
+
     def create_table(self, table_name: str) -> None:
         """
         Creates a new table in the database with the specified name.
@@ -49,21 +107,42 @@ class GachaDatabase:
             table_name: A string representing the name of the table to create.
         """
 
-        self.__exec_update(f'''CREATE TABLE IF NOT EXISTS {table_name} (
-            uid TEXT,
-            gacha_id TEXT,
-            gacha_type TEXT,
-            item_id TEXT,
-            count TEXT,
-            time TEXT,
-            name TEXT,
-            lang TEXT,
-            item_type TEXT,
-            rank_type TEXT,
-            region TEXT,
-            region_time_zone TEXT,
-            id TEXT PRIMARY KEY
-        );''')
+        for sql in self.table_schema(table_name):
+            self.__exec_update(sql)
+
+    @staticmethod
+    def table_schema(table_name: str) -> List[str]:
+        """
+        Returns the statements creating a table and its indexes.
+
+        Args:
+            table_name: A string representing the name of the table.
+
+        Returns:
+            A list of strings representing the SQL statements.
+        """
+
+        return [
+            f'''CREATE TABLE IF NOT EXISTS {table_name} (
+                uid TEXT,
+                gacha_id TEXT,
+                gacha_type INTEGER,
+                item_id TEXT,
+                count TEXT,
+                time INTEGER,
+                name TEXT,
+                lang TEXT,
+                item_type TEXT,
+                rank_type INTEGER,
+                region TEXT,
+                region_time_zone TEXT,
+                id INTEGER PRIMARY KEY
+            );''',
+            f'''CREATE INDEX IF NOT EXISTS idx_{table_name}_time
+                ON {table_name} (time);''',
+            f'''CREATE INDEX IF NOT EXISTS idx_{table_name}_rank_id
+                ON {table_name} (rank_type, id);''',
+        ]
 
     def add_entry(self, table: str, entry: Dict[str, str]) -> None:
         """
@@ -75,29 +154,99 @@ class GachaDatabase:
             entry: A dictionary representing the entry to add to the table.
         """
 
-        self.__exec_update(
-            f'''INSERT INTO {table} ({self.columns})
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);''',
-            self.parse_entry(entry),
-        )
+        self.__exec_update(self.insert_sql(table), self.parse_entry(entry))
 
-    def get_entries(self, table: str) -> List[Dict[str, str]]:
+    def add_entries(
+        self,
+        table: str,
+        entries: Iterable[Dict[str, str]],
+        skip_existing: bool = False,
+    ) -> int:
         """
-        Retrieves all entries from the specified table in the database.
+        Adds entries to the specified table in a single transaction, which is
+        much faster than calling `add_entry` for each of them because the
+        database is committed (and synced to disk) only once.
+
+        Args:
+            table: A string representing the name of the table to add the
+                entries to.
+            entries: An iterable of dictionaries representing the entries to
+                add to the table.
+            skip_existing: A boolean, if True, entries whose id is already in
+                the table are ignored instead of failing the insertion.
+
+        Returns:
+            An integer representing the number of inserted entries.
+        """
+
+        with self.transaction() as cursor:
+            cursor.executemany(
+                self.insert_sql(table, skip_existing),
+                map(self.parse_entry, entries),
+            )
+            return cursor.rowcount
+
+    def insert_sql(self, table: str, skip_existing: bool = False) -> str:
+        insert = 'INSERT OR IGNORE' if skip_existing else 'INSERT'
+        return f'''{insert} INTO {table} ({self.columns})
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);'''
+
+    def get_entries(
+        self,
+        table: str,
+        rank_type: Optional[int] = None,
+        raw: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """
+        Retrieves entries from the specified table in the database, newest
+        first.
 
         Args:
             table: A string representing the name of the table to retrieve
                 entries from.
+            rank_type: An optional integer, only entries of this rank are
+                retrieved if given.
+            raw: A boolean, if True, the values are returned as they are
+                stored (integer ids, ranks, types and epoch times) instead
+                of strings.
 
         Returns:
             A list of dictionaries representing the entries retrieved from the
                 table.
         """
 
-        self.cursor.execute(f'SELECT {self.columns} FROM {table};')
+        if rank_type is None:
+            self.cursor.execute(
+                f'SELECT {self.columns} FROM {table} ORDER BY id DESC;',
+            )
+        else:
+            self.cursor.execute(
+                f'''SELECT {self.columns} FROM {table}
+                    WHERE rank_type = ? ORDER BY id DESC;''',
+                (rank_type,),
+            )
         entries = self.cursor.fetchall()
+        if raw:
+            keys = self.columns.split(', ')
+            return [dict(zip(keys, entry)) for entry in entries]
         return [self.unparse_entry(*entry) for entry in entries]
 
+    def get_latest_id(self, table: str) -> str:
+        """
+        Retrieves the id of the newest entry in the specified table.
+
+        Args:
+            table: A string representing the name of the table to query.
+
+        Returns:
+            A string representing the largest id in the table, or '0' if the
+                table is empty.
+        """
+
+        self.cursor.execute(f'SELECT MAX(id) FROM {table};')
+        latest_id = self.cursor.fetchone()[0]
+        return '0' if latest_id is None else str(latest_id)
+
     def close(self) -> None:
         """
         Closes the connection to the database.
@@ -145,17 +294,17 @@ class GachaDatabase:
 
         uid = entry['uid']
         gacha_id = entry['gacha_id']
-        gacha_type = entry['gacha_type']
+        gacha_type = int(entry['gacha_type'])
         item_id = entry['item_id']
         count = entry['count']
-        time_ = entry['time']
+        region_time_zone = str(entry['region_time_zone'])
+        time_ = parse_time(entry['time'], region_time_zone)
         name = entry['name']
         lang = entry['lang']
         item_type = entry['item_type']
-        rank_type = entry['rank_type']
+        rank_type = int(entry['rank_type'])
         region = entry['region']
-        region_time_zone = entry['region_time_zone']
-        id_ = entry['id']
+        id_ = int(entry['id'])
         return (
             uid, gacha_id, gacha_type, item_id, count, time_, name, lang,
             item_type, rank_type, region, region_time_zone, id_,
@@ -163,9 +312,9 @@ class GachaDatabase:
 
     @staticmethod
     def unparse_entry(
-        uid: str, gacha_id: str, gacha_type: str, item_id: str, count: str,
-        time_: str, name: str, lang: str, item_type: str, rank_type: str,
-        region: str, region_time_zone: str, id_: str,
+        uid: str, gacha_id: str, gacha_type: int, item_id: str, count: str,
+        time_: int, name: str, lang: str, item_type: str, rank_type: int,
+        region: str, region_time_zone: str, id_: int,
     ) -> Dict[str, str]:
         """
         Unparses a tuple from the database into an entry dictionary.
@@ -173,23 +322,27 @@ class GachaDatabase:
         Args:
             uid: A string representing the UID of the entry.
             gacha_id: A string representing the Gacha ID of the entry.
-            gacha_type: A string representing the Gacha type of the entry.
+            gacha_type: An integer representing the Gacha type of the entry.
             item_id: A string representing the Item ID of the entry.
             count: A string representing the count of the entry.
-            time_: A string representing the timestamp of the entry.
+            time_: An integer representing the epoch time of the entry.
             name: A string representing the name of the entry.
             lang: A string representing the language of the entry.
             item_type: A string representing the Item type of the entry.
-            rank_type: A string representing the Rank type of the entry.
-            id_: A string representing the ID of the entry.
+            rank_type: An integer representing the Rank type of the entry.
+            region: A string representing the region of the entry.
+            region_time_zone: A string representing the time zone of the
+                region.
+            id_: An integer representing the ID of the entry.
 
         Returns:
             A dictionary representing the unparsed entry.
         """
 
         return dict(
-            uid=uid, gacha_id=gacha_id, gacha_type=gacha_type,
-            item_id=item_id, count=count, time=time_, name=name,
-            lang=lang, item_type=item_type, rank_type=rank_type,
-            region=region, region_time_zone=region_time_zone, id=id_,
+            uid=uid, gacha_id=gacha_id, gacha_type=str(gacha_type),
+            item_id=item_id, count=count,
+            time=format_time(time_, region_time_zone), name=name,
+            lang=lang, item_type=item_type, rank_type=str(rank_type),
+            region=region, region_time_zone=region_time_zone, id=str(id_),
         )
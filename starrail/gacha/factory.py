@@ -7,7 +7,7 @@ logger = loggings.get_logger(__file__)
 
 class DatabaseFactory:
 
-    API_VERSION = 2
+    API_VERSION = 3
 
     @staticmethod
     def get_database(db_name: str) -> GachaDatabase:
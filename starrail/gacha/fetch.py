@@ -1,26 +1,31 @@
 import json
 import traceback
 
-import requests
-
 from starrail.utils import loggings
+from starrail.utils.session import get_session
 
 logger = loggings.get_logger(__file__)
 
 
-def fetch_json(url, timeout=None):  # no typing annotations to pass mypy check
+# no typing annotations to pass mypy check
+def fetch_json(url, timeout=None, session=None):
     """
     Fetches JSON content from a URL and returns it as a dictionary.
 
     Args:
         url: A string representing the URL to fetch the JSON content from.
+        timeout: The timeout (seconds) of the request, the default timeout of
+            the session is used if None.
+        session: The requests session to use, the shared session is used if
+            None.
 
     Returns:
         A dictionary representing the JSON content fetched from the URL.
     """
 
+    session = session or get_session()
     try:
-        r = requests.get(url, timeout=timeout)
+        r = session.get(url, timeout=timeout)
         if 200 <= r.status_code < 300:
             content = r.content.decode('utf-8', errors='ignore')
             payload = json.loads(content)
@@ -31,9 +36,10 @@ def fetch_json(url, timeout=None):  # no typing annotations to pass mypy check
     return None, -1
 
 
-def fetch_text(url):
+def fetch_text(url, timeout=None, session=None):
+    session = session or get_session()
     try:
-        r = requests.get(url)
+        r = session.get(url, timeout=timeout)
         if 200 <= r.status_code < 300:
             content = r.content.decode('utf-8', errors='ignore')
             return content, r.status_code
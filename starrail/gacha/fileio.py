@@ -1,7 +1,13 @@
+import csv
+import functools
+import heapq
 import json
+import os
 import time
-
-import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from typing import (
+    Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union,
+)
 
 import starrail
 import starrail.utils.babelfish as babelfish
@@ -12,98 +18,246 @@ from starrail.utils import loggings
 
 logger = loggings.get_logger(__file__)
 
+Chunks = Iterator[str]
+encode_string = json.encoder.encode_basestring  # ensure_ascii=False
+srgf_keys = (
+    'gacha_id', 'gacha_type', 'item_id', 'count', 'time', 'name',
+    'item_type', 'rank_type', 'id',
+)
+
 
 def export_as_sql(manager: GachaDataManager, output_path: str) -> None:
     logger.info(f'Exporting data to cache {output_path}')
     with DatabaseFactory.get_database(output_path) as db:
         for gacha_type in GachaType:
-            should_insert = []
-            for entry in manager.gacha[gacha_type.value]:
-                if 'existing' in entry and not entry['existing']:
-                    should_insert.append(entry)
+            should_insert = manager.new_records[gacha_type.value]
             logger.info(
                 f'Exporting {gacha_type.name}, '
                 f'totally {len(should_insert)} new items',
             )
-            rev_insert = reversed(should_insert)
-            for entry in rev_insert:
-                db.add_entry(gacha_type.name, entry)
+            db.add_entries(gacha_type.name, reversed(should_insert))
+
+
+class ExportSnapshot:
+    """
+    Records and statistics of a GachaDataManager, materialized at most once
+    and shared by all the writers of an export, including writers running
+    in parallel threads.
+    """
+
+    def __init__(self, manager: GachaDataManager):
+        self.uid = manager.uid
+        self.manager = manager
+
+    @classmethod
+    def of(cls, source: 'Exportable') -> 'ExportSnapshot':
+        if isinstance(source, ExportSnapshot):
+            return source
+        return cls(source)
+
+    @functools.cached_property
+    def records(self) -> Dict[GachaType, List[Dict[str, str]]]:
+        # records of each gacha type, sorted from the newest to the oldest
+        records = dict()
+        for gacha_type in GachaType:
+            data_list = self.manager.gacha[gacha_type.value]
+            data_list.sort()
+            records[gacha_type] = data_list.tolist()
+        return records
+
+    @functools.cached_property
+    def stats(self) -> Dict[GachaType, List[Dict[str, Any]]]:
+        return {
+            gacha_type: self.manager.gacha[gacha_type.value].stats
+            for gacha_type in GachaType
+        }
+
+    def items(self) -> Iterator[Tuple[GachaType, List[Dict[str, str]]]]:
+        return iter(self.records.items())
+
 
+Exportable = Union[GachaDataManager, ExportSnapshot]
 
-def export_as_json(manager: GachaDataManager, output_path: str) -> None:
-    data_dict = dict()
-    for gacha_type in GachaType:
-        data_dict[gacha_type.name] = manager.gacha[gacha_type.value].tolist()
+
+def write_chunks(chunks: Iterable[str], output_path: str) -> None:
     with open(output_path, 'w', encoding='utf-8') as fout:
-        json.dump(data_dict, fout, indent=2, ensure_ascii=False)
+        fout.writelines(chunks)
+
+
+def encode_record(record: Dict[str, str], level: int, compact: bool) -> str:
+    # same output as json.dumps(record, indent=2) nested at `level`, but
+    # much faster since all values are strings
+    if compact:
+        items = ','.join(
+            f'{encode_string(k)}:{encode_string(v)}' for k, v in record.items()
+        )
+        return f'{{{items}}}'
+    pad = '  ' * level
+    items = f',\n{pad}  '.join(
+        f'{encode_string(k)}: {encode_string(v)}' for k, v in record.items()
+    )
+    return f'{{\n{pad}  {items}\n{pad}}}'
+
+
+def encode_list(
+    records: Iterable[Dict[str, str]],
+    level: int,
+    compact: bool,
+) -> Chunks:
+    if compact:
+        start, separator, end = '[', ',', ']'
+    else:
+        pad = '  ' * level
+        start = f'[\n{pad}  '
+        separator = f',\n{pad}  '
+        end = f'\n{pad}]'
+    prefix = start
+    for record in records:
+        yield prefix + encode_record(record, level + 1, compact)
+        prefix = separator
+    yield '[]' if prefix is start else end
 
 
-def export_as_xlsx(manager: GachaDataManager, output_path: str) -> None:
+def encode_value(value: Any, level: int, compact: bool) -> str:
+    if compact:
+        return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+    text = json.dumps(value, ensure_ascii=False, indent=2)
+    return text.replace('\n', '\n' + '  ' * level)
+
+
+def encode_document(
+    items: Iterable[Tuple[str, Chunks]],
+    compact: bool,
+) -> Chunks:
+    if compact:
+        start, separator, colon = '{', ',', ':'
+    else:
+        start, separator, colon = '{\n  ', ',\n  ', ': '
+    prefix = start
+    for key, chunks in items:
+        yield f'{prefix}{encode_string(key)}{colon}'
+        yield from chunks
+        prefix = separator
+    yield '}' if compact else '\n}'
+
+
+def generate_json(manager: Exportable, compact: bool = False) -> Chunks:
+    yield from encode_document(
+        (
+            (gacha_type.name, encode_list(records, 1, compact))
+            for gacha_type, records in ExportSnapshot.of(manager).items()
+        ),
+        compact,
+    )
+
+
+def export_as_json(
+    manager: Exportable,
+    output_path: str,
+    compact: bool = False,
+) -> None:
+    write_chunks(generate_json(manager, compact), output_path)
+
+
+def export_as_xlsx(
+    manager: Exportable,
+    output_path: str,
+    backend: str = 'native',
+) -> None:
+    if backend == 'pandas':
+        return export_as_xlsx_pandas(manager, output_path)
+    if backend != 'native':
+        raise ValueError(f'Unknown export backend: {backend}')
+    from openpyxl import Workbook
+
+    # rows are streamed to the file, same layout as DataFrame.to_excel
+    workbook = Workbook(write_only=True)
+    for gacha_type, records in ExportSnapshot.of(manager).items():
+        sheet = workbook.create_sheet(gacha_type.name)
+        for index, record in enumerate(records):
+            if index == 0:
+                sheet.append([None, *record])
+            sheet.append([index, *record.values()])
+    workbook.save(output_path)
+
+
+def export_as_xlsx_pandas(
+    manager: Exportable,
+    output_path: str,
+) -> None:
+    import pandas as pd
+
     with pd.ExcelWriter(output_path) as writer:
-        for gacha_type in GachaType:
-            df = pd.json_normalize(manager.gacha[gacha_type.value].tolist())
+        for gacha_type, records in ExportSnapshot.of(manager).items():
+            df = pd.json_normalize(records)
             df.to_excel(writer, sheet_name=gacha_type.name)
 
 
-def export_as_csv(manager: GachaDataManager, output_path: str) -> None:
+def export_as_csv(
+    manager: Exportable,
+    output_path: str,
+    backend: str = 'native',
+) -> None:
+    if backend == 'pandas':
+        return export_as_csv_pandas(manager, output_path)
+    if backend != 'native':
+        raise ValueError(f'Unknown export backend: {backend}')
+    # same layout as DataFrame.to_csv: a leading index column
+    with open(output_path, 'w', encoding='utf-8', newline='') as fout:
+        writer = csv.writer(fout, lineterminator=os.linesep)
+        index = 0
+        for _, records in ExportSnapshot.of(manager).items():
+            for record in records:
+                if index == 0:
+                    writer.writerow(['', *record])
+                writer.writerow([index, *record.values()])
+                index += 1
+        if index == 0:
+            writer.writerow([''])
+
+
+def export_as_csv_pandas(
+    manager: Exportable,
+    output_path: str,
+) -> None:
+    import pandas as pd
+
     data_list = []
-    for gacha_type in GachaType:
-        data_list.extend(manager.gacha[gacha_type.value].tolist())
+    for _, records in ExportSnapshot.of(manager).items():
+        data_list.extend(records)
     df = pd.json_normalize(data_list)
     df.to_csv(output_path, encoding='utf-8')
 
 
-def export_as_md(manager: GachaDataManager, output_path: str) -> None:
-    md = f'# {babelfish.gacha_report()}\n\n'
-    for gacha_type in GachaType:
-        md += f'## {babelfish.translate(gacha_type.name)}\n\n'
-        md += babelfish.markdown_thead()
-        stats = manager.gacha[gacha_type.value].stats
+def generate_md(manager: Exportable) -> Chunks:
+    snapshot = ExportSnapshot.of(manager)
+    yield f'# {babelfish.gacha_report()}\n\n'
+    for gacha_type, stats in snapshot.stats.items():
+        yield f'## {babelfish.translate(gacha_type.name)}\n\n'
+        yield babelfish.markdown_thead()
         for item in stats:
             rtype = item['rank_type']
             count = item['count']
             basic = item['basic_prob']
             compr = item['compr_prob']
             since_last = item['since_last']
-            md += f'|{rtype}|{count}|{basic}|{compr}|{since_last}|\n'
-        md += '\n'
+            yield f'|{rtype}|{count}|{basic}|{compr}|{since_last}|\n'
+        yield '\n'
         if stats[0]['attempts']:
             attempt_string = ' '.join(stats[0]['attempts'])
             average = stats[0]['average']
-            md += f'{babelfish.history_of_5_stars()}: '
-            md += f'**{attempt_string}**\n\n'
-            md += f'{babelfish.average_gacha_per_5_star()}: **{average}**\n\n'
-    with open(output_path, 'w', encoding='utf-8') as fout:
-        fout.write(md)
+            yield f'{babelfish.history_of_5_stars()}: '
+            yield f'**{attempt_string}**\n\n'
+            yield f'{babelfish.average_gacha_per_5_star()}: **{average}**\n\n'
 
 
-def export_as_html(manager: GachaDataManager, output_path: str) -> None:
-    title = f'{babelfish.gacha_title(manager.uid)}'
-    content = f'<h1>{babelfish.gacha_report()}</h1>\n'
-    for gacha_type in GachaType:
-        content += f'<h2>{babelfish.translate(gacha_type.name)}</h2>\n'
-        thead = babelfish.html_thead()
-        table = f'<table><thead><tr>{thead}</tr></thead><tbody>\n'
-        stats = manager.gacha[gacha_type.value].stats
-        for item in stats:
-            rtype = item['rank_type']
-            count = item['count']
-            basic = item['basic_prob']
-            compr = item['compr_prob']
-            since_last = item['since_last']
-            table += (
-                f'<tr><td>{rtype}</td><td>{count}</td><td>{basic}</td>'
-                f'<td>{compr}</td><td>{since_last}</td></tr>\n'
-            )
-        table += '</tbody></table>\n'
-        content += table
-        if stats[0]['attempts']:
-            attempt_string = ' '.join(stats[0]['attempts'])
-            average = stats[0]['average']
-            content += f'<p>{babelfish.history_of_5_stars()}: '
-            content += f'<b>{attempt_string}</b></p>\n'
-            content += f'<p>{babelfish.average_gacha_per_5_star()}: '
-            content += f'<b>{average}</b></p>\n'
+def export_as_md(manager: Exportable, output_path: str) -> None:
+    write_chunks(generate_md(manager), output_path)
+
+
+def generate_html(manager: Exportable) -> Chunks:
+    snapshot = ExportSnapshot.of(manager)
+    title = f'{babelfish.gacha_title(snapshot.uid)}'
     style = (
         '<style type="text/css">'
         r'html {font-family: sans-serif;} '
@@ -119,47 +273,149 @@ def export_as_html(manager: GachaDataManager, output_path: str) -> None:
         r'tr:nth-child(even) td {background-color: #f2f2f2;} '
         '</style>'
     )
-    html = (
+    yield (
         f'<html lang="zh"><head><title>{title}</title><meta charset="UTF-8">'
-        f'{style}</head><body>{content}</body></html>'
+        f'{style}</head><body>'
     )
-    with open(output_path, 'w', encoding='utf-8') as fout:
-        fout.write(html)
-
-
-def export_as_srgf(manager: GachaDataManager, output_path: str) -> None:
-    gacha_list = []
-    for gacha_type in GachaType:
-        gacha_list.extend(manager.gacha[gacha_type.value].tolist())
-    gacha_list.sort(key=lambda x: x['id'])
-    uid = gacha_list[-1]['uid'] if gacha_list else manager.uid
-    lang = gacha_list[-1]['lang'] if gacha_list else 'zh-cn'
-    timezone = gacha_list[-1]['region_time_zone'] if gacha_list else '8'
-    timezone = int(timezone)
+    yield f'<h1>{babelfish.gacha_report()}</h1>\n'
+    for gacha_type, stats in snapshot.stats.items():
+        yield f'<h2>{babelfish.translate(gacha_type.name)}</h2>\n'
+        thead = babelfish.html_thead()
+        yield f'<table><thead><tr>{thead}</tr></thead><tbody>\n'
+        for item in stats:
+            rtype = item['rank_type']
+            count = item['count']
+            basic = item['basic_prob']
+            compr = item['compr_prob']
+            since_last = item['since_last']
+            yield (
+                f'<tr><td>{rtype}</td><td>{count}</td><td>{basic}</td>'
+                f'<td>{compr}</td><td>{since_last}</td></tr>\n'
+            )
+        yield '</tbody></table>\n'
+        if stats[0]['attempts']:
+            attempt_string = ' '.join(stats[0]['attempts'])
+            average = stats[0]['average']
+            yield f'<p>{babelfish.history_of_5_stars()}: '
+            yield f'<b>{attempt_string}</b></p>\n'
+            yield f'<p>{babelfish.average_gacha_per_5_star()}: '
+            yield f'<b>{average}</b></p>\n'
+    yield '</body></html>'
+
+
+def export_as_html(manager: Exportable, output_path: str) -> None:
+    write_chunks(generate_html(manager), output_path)
+
+
+def generate_srgf(manager: Exportable, compact: bool = False) -> Chunks:
+    snapshot = ExportSnapshot.of(manager)
+    data_lists = list(snapshot.records.values())
+    # the first record of each list is its newest one
+    heads = [data_list[0] for data_list in data_lists if len(data_list)]
+    latest = max(heads, key=lambda x: int(x['id']), default=None)
+    uid = latest['uid'] if latest else snapshot.uid
+    lang = latest['lang'] if latest else 'zh-cn'
+    timezone = int(latest['region_time_zone'] if latest else '8')
     timestamp = int(time.time())
-    data = dict(
-        info=dict(
-            uid=uid,
-            lang=lang,
-            region_time_zone=timezone,
-            export_timestamp=timestamp,
-            export_app='StarRailToolkit',
-            export_app_version=starrail.__version__,
-            srgf_version='v1.0',
-        ),
-        list=[
-            dict(
-                gacha_id=item['gacha_id'],
-                gacha_type=item['gacha_type'],
-                item_id=item['item_id'],
-                count=item['count'],
-                time=item['time'],
-                name=item['name'],
-                item_type=item['item_type'],
-                rank_type=item['rank_type'],
-                id=item['id'],
-            ) for item in gacha_list
+    info = dict(
+        uid=uid,
+        lang=lang,
+        region_time_zone=timezone,
+        export_timestamp=timestamp,
+        export_app='StarRailToolkit',
+        export_app_version=starrail.__version__,
+        srgf_version='v1.0',
+    )
+    # merges the lists of all gacha types from the oldest to the newest
+    records = heapq.merge(
+        *map(reversed, data_lists), key=lambda x: int(x['id']),
+    )
+    items = ({key: item[key] for key in srgf_keys} for item in records)
+    yield from encode_document(
+        [
+            ('info', iter([encode_value(info, 1, compact)])),
+            ('list', encode_list(items, 1, compact)),
         ],
+        compact,
     )
-    with open(output_path, 'w', encoding='utf-8') as fout:
-        json.dump(data, fout, indent=2, ensure_ascii=False)
+
+
+def export_as_srgf(
+    manager: Exportable,
+    output_path: str,
+    compact: bool = False,
+) -> None:
+    write_chunks(generate_srgf(manager, compact), output_path)
+
+
+export_hooks = dict(
+    csv=export_as_csv,
+    html=export_as_html,
+    json=export_as_json,
+    md=export_as_md,
+    srgf=export_as_srgf,
+    xlsx=export_as_xlsx,
+)
+
+
+def export_formats(
+    manager: Exportable,
+    formats: Iterable[str],
+    output_dir: str,
+    options: Optional[Dict[str, Dict[str, Any]]] = None,
+    parallel: bool = False,
+) -> Dict[str, str]:
+    """
+    Exports gacha data to several formats. Records and statistics are
+    materialized once and shared by the writers of all formats.
+
+    Args:
+        manager (Exportable): The gacha data to export.
+        formats (Iterable[str]): The formats to export, `all` stands for all
+            the formats in `export_hooks`.
+        output_dir (str): The directory of exported files.
+        options (Dict[str, Dict[str, Any]], optional): Keyword arguments of
+            the writer of each format, e.g. `dict(json=dict(compact=True))`.
+        parallel (bool): Whether the writers run in parallel threads.
+
+    Returns:
+        Dict[str, str]: The path of the exported file of each format.
+    """
+
+    formats = list(export_hooks) if 'all' in formats else list(formats)
+    options = options or dict()
+    snapshot = ExportSnapshot.of(manager)
+    start = time.perf_counter()
+    # materialized before the writers start, they only read the snapshot
+    snapshot.records
+    snapshot.stats
+    elapsed = time.perf_counter() - start
+    logger.info(f'Gacha data of uid {snapshot.uid} loaded in {elapsed:.3f}s')
+
+    timestamp = time.strftime('%Y%m%d%H%M%S')
+    paths = dict()
+    for format in formats:
+        filename = f'HKSR-export-{snapshot.uid}-{timestamp}.{format}'
+        if format == 'srgf':
+            filename += '.json'
+        paths[format] = os.path.join(output_dir, filename)
+
+    def export(format):
+        logger.info(f'Exporting gacha data as {format} format')
+        start = time.perf_counter()
+        hook = export_hooks[format]
+        hook(snapshot, paths[format], **options.get(format, dict()))
+        elapsed = time.perf_counter() - start
+        logger.info(
+            f'Gacha data in {format} format is saved to {paths[format]} '
+            f'in {elapsed:.3f}s',
+        )
+
+    if parallel and len(formats) > 1:
+        with ThreadPoolExecutor(max_workers=len(formats)) as executor:
+            # consumes the results so that exceptions are raised here
+            list(executor.map(export, formats))
+    else:
+        for format in formats:
+            export(format)
+    return paths
@@ -30,6 +30,43 @@ def migrate_1(db: GachaDatabase):
     db.version = 2
 
 
+def migrate_2(db: GachaDatabase):
+    """By the time database api version is bumped to 3, id, time, rank_type
+    and gacha_type are stored as integers (time as epoch seconds) and tables
+    are indexed by time and (rank_type, id). All the tables and the version
+    are updated in one transaction holding the write lock, and the version is
+    checked again inside it, so that an interrupted migration leaves the
+    database untouched and a concurrent one does not convert the data twice.
+    """
+    legacy_columns = (
+        'uid, gacha_id, CAST(gacha_type AS INTEGER), item_id, count, '
+        "CAST(strftime('%s', time) AS INTEGER) "
+        '- CAST(region_time_zone AS INTEGER) * 3600, '
+        'name, lang, item_type, CAST(rank_type AS INTEGER), region, '
+        'region_time_zone, CAST(id AS INTEGER)'
+    )
+    with db.transaction(immediate=True) as cursor:
+        cursor.execute('PRAGMA user_version;')
+        if cursor.fetchone()[0] != 2:
+            return  # migrated by another connection meanwhile
+        for gacha_type in GachaType:
+            table = gacha_type.name
+            legacy = f'{table}_legacy'
+            cursor.execute(f'ALTER TABLE {table} RENAME TO {legacy};')
+            cursor.execute(f'DROP INDEX IF EXISTS idx_{table}_time;')
+            cursor.execute(f'DROP INDEX IF EXISTS idx_{table}_rank_id;')
+            for sql in db.table_schema(table):
+                cursor.execute(sql)
+            cursor.execute(
+                f'''INSERT OR IGNORE INTO {table} ({db.columns})
+                    SELECT {legacy_columns} FROM {legacy};''',
+            )
+            cursor.execute(f'DROP TABLE {legacy};')
+        cursor.execute('PRAGMA user_version=3;')
+
+
 def migrate(db: GachaDatabase):
     if db.version == 1:
         migrate_1(db)
+    if db.version == 2:
+        migrate_2(db)
@@ -1,168 +1,182 @@
-import copy
 import os
-import time
-from typing import Dict
-
-from prettytable import PrettyTable
+import threading
+from array import array
+from typing import Dict, List, Optional, Set
 
 from starrail.config import configuration as cfg
+from starrail.gacha.database import format_time, parse_time
 from starrail.gacha.factory import DatabaseFactory
+from starrail.gacha.stats import summarize
 from starrail.gacha.type import GachaType
 from starrail.utils import loggings
-from starrail.utils.babelfish.dictionary import record_type_mapping
 
 logger = loggings.get_logger(__file__)
 
 
+class StringPool:
+    """
+    Interns the strings stored in the columns of gacha data lists, so that
+    each distinct value (uid, name, item type, ...) is kept only once and
+    referenced by its index.
+    """
+
+    def __init__(self):
+        self.index: Dict[str, int] = dict()
+        self.strings: List[str] = []
+        self.lock = threading.Lock()
+
+    def __getitem__(self, index: int) -> str:
+        return self.strings[index]
+
+    def intern(self, value) -> int:
+        value = str(value)
+        index = self.index.get(value)
+        if index is None:
+            with self.lock:
+                index = self.index.get(value)
+                if index is None:
+                    index = len(self.strings)
+                    self.strings.append(value)
+                    self.index[value] = index
+        return index
+
+
+shared_strings = StringPool()
+
+
 class GachaDataList:
-    def __init__(self, name, iterable=[], hash_key='id'):
+    """
+    A list of gacha records of one gacha type, deduplicated by id. Records
+    are stored column by column in compact arrays, and record dicts are only
+    built when they are accessed.
+    """
+
+    string_columns = (
+        'uid', 'gacha_id', 'item_id', 'count', 'name', 'lang', 'item_type',
+        'region', 'region_time_zone',
+    )
+
+    def __init__(self, name, iterable=(), strings=shared_strings):
         self.name = name
-        self.data = []
-        self.hash = set()
-        self.hash_key = hash_key
+        self.strings = strings
+        self.ids = array('q')
+        self.times = array('i')
+        self.gacha_types = array('b')
+        self.rank_types = array('b')
+        self.columns = {key: array('I') for key in self.string_columns}
+        self.hash: Optional[Set[int]] = None
+        self._summary = None
         self.extend(iterable)
 
     def __len__(self):
-        return len(self.data)
+        return len(self.ids)
 
     def __getitem__(self, index):
-        return self.data[index]
+        if isinstance(index, slice):
+            return [self.row(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('GachaDataList index out of range')
+        return self.row(index)
+
+    def __iter__(self):
+        return (self.row(i) for i in range(len(self)))
+
+    def __reversed__(self):
+        return (self.row(i) for i in reversed(range(len(self))))
+
+    def row(self, index):
+        strings, columns = self.strings, self.columns
+        region_time_zone = strings[columns['region_time_zone'][index]]
+        return dict(
+            uid=strings[columns['uid'][index]],
+            gacha_id=strings[columns['gacha_id'][index]],
+            gacha_type=str(self.gacha_types[index]),
+            item_id=strings[columns['item_id'][index]],
+            count=strings[columns['count'][index]],
+            time=format_time(self.times[index], region_time_zone),
+            name=strings[columns['name'][index]],
+            lang=strings[columns['lang'][index]],
+            item_type=strings[columns['item_type'][index]],
+            rank_type=str(self.rank_types[index]),
+            region=strings[columns['region'][index]],
+            region_time_zone=region_time_zone,
+            id=str(self.ids[index]),
+        )
 
     def append(self, item):
-        if item[self.hash_key] not in self.hash:
-            self.data.append(item)
-            self.hash.add(item[self.hash_key])
-            return True
-        return False
+        # item can also be a raw database entry, whose time is an epoch
+        id_ = int(item['id'])
+        if self.hash is None:  # sorted, newest first
+            if self.ids and id_ >= self.ids[-1]:
+                if self.search(id_):
+                    return False
+                self.hash = set(self.ids)  # appending breaks the order
+        elif id_ in self.hash:
+            return False
+        time_ = item['time']
+        if not isinstance(time_, int):
+            time_ = parse_time(time_, str(item['region_time_zone']))
+        self.ids.append(id_)
+        self.times.append(time_)
+        self.gacha_types.append(int(item['gacha_type']))
+        self.rank_types.append(int(item['rank_type']))
+        for key, column in self.columns.items():
+            column.append(self.strings.intern(item[key]))
+        if self.hash is not None:
+            self.hash.add(id_)
+        self._summary = None
+        return True
 
     def extend(self, iterable):
         return [self.append(item) for item in iterable]
 
+    def search(self, id_):
+        # binary search in ids, which are sorted in descending order
+        ids = self.ids
+        lo, hi = 0, len(ids)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if ids[mid] > id_:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo < len(ids) and ids[lo] == id_
+
     def sort(self):
-        self.data.sort(key=lambda x: -int(x[self.hash_key]))
+        # newest first, columns are permuted in place only when necessary
+        if self.hash is None:
+            return
+        order = sorted(
+            range(len(self.ids)), key=self.ids.__getitem__, reverse=True,
+        )
+        arrays = [self.ids, self.times, self.gacha_types, self.rank_types]
+        arrays.extend(self.columns.values())
+        for column in arrays:
+            column[:] = array(column.typecode, map(column.__getitem__, order))
+        # while the records are sorted, ids are looked up by binary search
+        # instead of keeping a set of them
+        self.hash = None
 
     def tolist(self):
-        return copy.deepcopy(self.data)
+        return list(self)
+
+    @property
+    def summary(self):
+        # statistics are memoized until the list is modified
+        if self._summary is None:
+            self.sort()
+            self._summary = summarize(self)
+        return self._summary
 
     @property
     def stats_v2(self):
-        today = time.strftime('%y.%m.%d')
-        if not self.data:
-            return dict(
-                character5=0,
-                character4=0,
-                lightcone5=0,
-                lightcone4=0,
-                lightcone3=0,
-                total=0,
-                since_last=0,
-                average_up=0,
-                average_5=0,
-                start_time=today,
-                end_time=today,
-                five_stars=[],
-            )
-        self.sort()
-        character5 = character4 = lightcone5 = lightcone4 = lightcone3 = 0
-        for item in self.data:
-            item_type = item['item_type']
-            item_type = record_type_mapping.get(item_type, item_type)
-            rank_type = item['rank_type']
-            if item_type == 'character':
-                if rank_type == '5':
-                    character5 += 1
-                elif rank_type == '4':
-                    character4 += 1
-            elif item_type == 'lightcone':
-                if rank_type == '5':
-                    lightcone5 += 1
-                elif rank_type == '4':
-                    lightcone4 += 1
-                elif rank_type == '3':
-                    lightcone3 += 1
-        five_stars = [['', 0, False]]
-        for item in reversed(self.data):
-            five_stars[-1][1] += 1
-            rank_type = item['rank_type']
-            name = item['name']
-            if rank_type == '5':
-                five_stars[-1] = (name, five_stars[-1][1], False)
-                five_stars.append(['', 0, False])
-        since_last = 0 if five_stars[-1][0] else five_stars[-1][1]
-        if not five_stars[-1][0]:
-            five_stars.pop(-1)
-        if not five_stars:
-            average_up = average_5 = 0
-        else:
-            average_5 = sum([it[1] for it in five_stars]) / len(five_stars)
-            ups = list(filter(lambda it: it[-1], five_stars))
-            average_up = sum([it[1] for it in ups]) / len(ups) if ups else 0
-        return dict(
-            character5=character5,
-            character4=character4,
-            lightcone5=lightcone5,
-            lightcone4=lightcone4,
-            lightcone3=lightcone3,
-            total=len(self.data),
-            since_last=since_last,
-            average_up=average_up,
-            average_5=average_5,
-            start_time=self.data[-1]['time'].split()[0].replace('-', '.'),
-            end_time=self.data[0]['time'].split()[0].replace('-', '.'),
-            five_stars=five_stars,
-        )
+        return self.summary['overview']
 
     @property
     def stats(self):
-        data = []
-        for rank_type in ['5', '4', '3']:
-            data.append(self.substats(rank_type))
-        return data
-
-    def substats(self, rank_type):
-        count = sum([
-            1 if item['rank_type'] ==
-            rank_type else 0 for item in self.data
-        ])
-        total_items = len(self.data)
-        if not total_items or not count:
-            return dict(
-                rank_type=rank_type,
-                count='0',
-                basic_prob='',
-                compr_prob='',
-                since_last=f'{total_items}',
-                attempts=[],
-                average='',
-            )
-        if rank_type == '3':
-            return dict(
-                rank_type=rank_type,
-                count=f'{count}',
-                basic_prob=f'{count / total_items:.2%}',
-                compr_prob='',
-                since_last='',
-                attempts=[],
-                average='',
-            )
-        attempts = []
-        current_stats, current_attempts = None, 0
-        for item in self.data + [dict(rank_type=rank_type, name='dummy')]:
-            if item['rank_type'] == rank_type:
-                attempts.append((current_stats, current_attempts))
-                current_stats, current_attempts = item['name'], 0
-            current_attempts += 1
-        since_last = attempts[0][1]
-        attempts = [f'{name}@{times}' for (name, times) in attempts]
-        return dict(
-            rank_type=rank_type,
-            count=f'{count}',
-            basic_prob=f'{count / total_items:.2%}',
-            compr_prob=f'{count / (total_items - since_last):.2%}',
-            since_last=f'{since_last}',
-            attempts=attempts[1:],
-            average=f'{(total_items - since_last) / count:.2f}',
-        )
+        return self.summary['ranks']
 
 
 class GachaDataManager:
@@ -170,22 +184,24 @@ class GachaDataManager:
     def __init__(self, uid):
         self.uid = uid
         self.gacha = self.load_cache(uid)
+        self.new_records = {gt.value: [] for gt in GachaType}
 
     def load_cache(self, uid: str):
-        db_dir = cfg.db_dir
-        self.cache_path = os.path.join(db_dir, f'{uid}.sqlite3')
+        self.cache_path = get_cache_path(uid)
         if os.path.isfile(self.cache_path):
             return parse_cache_from_sql(self.cache_path)
         return init_empty_gacha_record()
 
     def log_stats(self):
         # a simple version
+        import prettytable
+
         fileds = ['Type', 'Count', 'Basic Prob.', ' True Prob.', 'Since Last']
         stats_string = f'*** Gacha stats for user uid = {self.uid}:\n'
         for gacha_type in GachaType:
             stats_string += f'  * {gacha_type.name}\n'
             stats = self.gacha[gacha_type.value].stats
-            table = PrettyTable(field_names=fileds)
+            table = prettytable.PrettyTable(field_names=fileds)
             for item in stats:
                 table.add_row([
                     item['rank_type'], item['count'],
@@ -206,15 +222,32 @@ class GachaDataManager:
 
     def add_records(self, gacha_id, records):
         r = self.gacha[gacha_id].extend(records)
-        for success, record in zip(r, records):
-            record['existing'] = not success
+        self.new_records[gacha_id].extend(
+            record for success, record in zip(r, records) if success
+        )
+
+
+def get_cache_path(uid: str) -> str:
+    return os.path.join(cfg.db_dir, f'{uid}.sqlite3')
+
+
+def get_latest_cached_ids(uid: str) -> Dict[GachaType, int]:
+    # the id of the newest cached record of each gacha type, 0 if none
+    cache_path = get_cache_path(uid)
+    if not os.path.isfile(cache_path):
+        return {gacha_type: 0 for gacha_type in GachaType}
+    with DatabaseFactory.get_database(cache_path) as db:
+        return {
+            gacha_type: int(db.get_latest_id(gacha_type.name))
+            for gacha_type in GachaType
+        }
 
 
 def parse_cache_from_sql(cache_path: str) -> Dict[int, GachaDataList]:
     cache = dict()
     with DatabaseFactory.get_database(cache_path) as db:
         for gacha_type in GachaType:
-            entries = db.get_entries(gacha_type.name)
+            entries = db.get_entries(gacha_type.name, raw=True)
             data_list = GachaDataList(gacha_type.name, entries)
             cache[gacha_type.value] = data_list
     return cache
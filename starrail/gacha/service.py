@@ -1,21 +1,45 @@
 import json
 import os
+import threading
 import time
 import traceback
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional
 
 import starrail.gacha.fileio as fileio
 from starrail.gacha.autodet import detect_api_url
 from starrail.gacha.fetch import fetch_json
-from starrail.gacha.parse import GachaDataManager
+from starrail.gacha.parse import GachaDataManager, get_latest_cached_ids
+from starrail.gacha.srgf import import_srgf
 from starrail.gacha.type import GachaType
 from starrail.gacha.url import get_api_url, get_url_template
 from starrail.utils import babelfish, loggings
 from starrail.utils.accounts import account_record
+from starrail.utils.ratelimit import HostRateLimiter, TokenBucket
 
 logger = loggings.get_logger(__file__)
 
 
+class InvalidApiError(ValueError):
+    """
+    The api URL is invalid or expired, `reason` tells why.
+    """
+
+    def __init__(self, reason: str):
+        super().__init__('Invalid or expired api, please check your input')
+        self.reason = reason
+
+
+class UidNotFoundError(ValueError):
+    """
+    The uid of the account cannot be deduced, as it has no gacha record.
+    """
+
+    def __init__(self):
+        super().__init__('Cannot deduce uid from records')
+
+
 def integers():
     r = 1
     while True:
@@ -44,19 +68,25 @@ def check_response(payload, code):
 def export_gacha_type(
     api_template: str,
     gacha_type: GachaType,
-    request_interval: float,
+    limiter: TokenBucket,
+    latest_id: Optional[int] = None,
+    on_page: Optional[Callable[[GachaType, int], None]] = None,
 ):
+    # paging stops at the record `latest_id` if given, which is cached
     r = []
     end_id = '0'
+    uid = ''
     for page in integers():
         logger.info(f'Downloading page {page} of type {gacha_type.name}')
+        if on_page is not None:
+            on_page(gacha_type, page)
         api_url = get_api_url(
             api_template, end_id, str(gacha_type.value),
             str(page), '20',
         )
+        limiter.acquire()
         logger.debug(f'Requesting {api_url}')
         response, code = fetch_json(api_url)
-        time.sleep(request_interval)
         _, should_stop, msg = check_response(response, code)
         logger.info(f'check_response: {msg}')
         if should_stop:
@@ -67,83 +97,262 @@ def export_gacha_type(
         metainfo = dict(region=region, region_time_zone=timezone)
         for data_item in data_list:
             data_item.update(metainfo)
+        uid = uid or data_list[0]['uid']
+        if latest_id is not None:  # stop paging at the newest cached record
+            new_items = [
+                item for item in data_list if int(item['id']) > latest_id
+            ]
+            if len(new_items) < len(data_list):
+                r.extend(new_items)
+                logger.info(
+                    f'Reached cached record {latest_id} of type '
+                    f'{gacha_type.name}, totally {len(r)} new items',
+                )
+                break
         r.extend(data_list)
         end_id = data_list[-1]['id']
-    return r
+    return r, uid
 
 
-def deduce_uid(record_cache):
+def export_gacha_types(
+    api_template: str,
+    request_interval: float = 0,
+    latest_ids: Optional[Dict[GachaType, int]] = None,
+    on_page: Optional[Callable[[GachaType, int], None]] = None,
+    limiter: Optional[TokenBucket] = None,
+):
+    # returns: records of each gacha type, uid of the account
+    # banners are downloaded concurrently, sharing one rate limiter so that
+    # `request_interval` still holds across all of them
+    if limiter is None:
+        limiter = TokenBucket(interval=request_interval)
+    with ThreadPoolExecutor(max_workers=len(GachaType)) as executor:
+        futures = {
+            gacha_type: executor.submit(
+                export_gacha_type,
+                api_template,
+                gacha_type,
+                limiter,
+                None if latest_ids is None else latest_ids[gacha_type],
+                on_page,
+            ) for gacha_type in GachaType
+        }
+        record_cache, uid = dict(), ''
+        for gacha_type, future in futures.items():
+            records, type_uid = future.result()
+            record_cache[gacha_type.value] = records
+            uid = uid or type_uid
+            logger.info(f'Finish downloading records of {gacha_type.name}')
+    return record_cache, uid
+
+
+def probe_uid(api_template: str, limiter: TokenBucket) -> str:
+    # the uid of the account, from the newest record of any gacha type
     for gacha_type in GachaType:
-        records = record_cache[gacha_type.value]
-        if records:
-            return records[0]['uid']
+        api_url = get_api_url(
+            api_template, '0', str(gacha_type.value), '1', '1',
+        )
+        limiter.acquire()
+        response, code = fetch_json(api_url)
+        _, should_stop, _ = check_response(response, code)
+        if not should_stop:
+            return response['data']['list'][0]['uid']
     return ''
 
 
-def export_gacha_from_api(api_url, export, request_interval):
-    if not api_url:
-        api_url = detect_api_url()
+cache_locks: Dict[str, threading.Lock] = defaultdict(threading.Lock)
+cache_locks_lock = threading.Lock()
+
+
+def get_cache_lock(uid: str) -> threading.Lock:
+    # serializes writes to the cache of an account shared by several syncs
+    with cache_locks_lock:
+        return cache_locks[uid]
+
+
+def sync_gacha(
+    api_url: str,
+    limiter: TokenBucket,
+    incremental: bool = True,
+    on_page: Optional[Callable[[GachaType, int], None]] = None,
+) -> GachaDataManager:
+    """
+    Downloads the gacha records of an account and saves the new ones to its
+    cache. The timestamp of the account record is not updated, which is
+    left to the caller since AccountRecord is not thread-safe.
+
+    Args:
+        api_url (str): The api URL of the account.
+        limiter (TokenBucket): The rate limiter shared by all the requests.
+        incremental (bool): Whether to stop paging at the newest cached
+            record.
+        on_page (Callable, optional): Called before each page is requested.
+
+    Returns:
+        GachaDataManager: The gacha data of the account, including the newly
+            downloaded records.
+
+    Raises:
+        InvalidApiError: If the api URL is invalid or expired.
+        UidNotFoundError: If the account has no gacha record.
+    """
+
+    limiter.acquire()
     response, code = fetch_json(api_url)
     valid, _, msg = check_response(response, code)
     logger.info(f'check_response (api): {msg}')
     if not valid:
         logger.fatal('Error while checking response from api URL, exitting')
-        raise ValueError('Invalid or expired api, please check your input')
+        raise InvalidApiError(msg)
 
     api_template = get_url_template(api_url)
-    record_cache = dict()
-
-    for gacha_type in GachaType:
-        records = export_gacha_type(
-            api_template,
-            gacha_type,
-            request_interval,
-        )
-        record_cache[gacha_type.value] = records
-        logger.info(f'Finish downloading records of {gacha_type.name}')
-
-    uid = deduce_uid(record_cache)
+    data_list = response['data']['list']
+    uid = data_list[0]['uid'] if data_list else probe_uid(
+        api_template, limiter,
+    )
     if not uid:
         logger.fatal(
             'Cannot deduce uid from records, there may be no gacha '
             'record. Please check your account and try again.',
         )
-        raise ValueError('Cannot deduce uid from records')
-    manager = GachaDataManager(uid)
-    logger.info(f'Successfully connected to cache of uid {uid}')
-    manager.log_stats()
+        raise UidNotFoundError()
+    latest_ids = None
+    if incremental:
+        # the cache is opened (and migrated) once, before the banner workers
+        with get_cache_lock(uid):
+            latest_ids = get_latest_cached_ids(uid)
+    record_cache, _ = export_gacha_types(
+        api_template,
+        latest_ids=latest_ids,
+        on_page=on_page,
+        limiter=limiter,
+    )
+    with get_cache_lock(uid):
+        manager = GachaDataManager(uid)
+        logger.info(f'Successfully connected to cache of uid {uid}')
+        for gacha_type in GachaType:
+            manager.add_records(
+                gacha_type.value, record_cache[gacha_type.value],
+            )
+            manager.gacha[gacha_type.value].sort()
+        fileio.export_as_sql(manager, manager.cache_path)
+    return manager
 
-    for gacha_type in GachaType:
-        manager.add_records(gacha_type.value, record_cache[gacha_type.value])
-        manager.gacha[gacha_type.value].sort()
 
-    fileio.export_as_sql(manager, manager.cache_path)
+def export_gacha_from_api(
+    api_url,
+    export,
+    request_interval,
+    incremental=True,
+    compact=False,
+    backend='native',
+    parallel=False,
+    game_dir=None,
+):
+    if not api_url:
+        api_url = detect_api_url(game_dir)
+    limiter = TokenBucket(interval=request_interval)
+    manager = sync_gacha(api_url, limiter, incremental)
 
-    account_record.update_timestamp(uid)
+    account_record.update_timestamp(manager.uid)
     manager.log_stats()
 
-    export_hooks = dict(
-        csv=fileio.export_as_csv,
-        html=fileio.export_as_html,
-        json=fileio.export_as_json,
-        md=fileio.export_as_md,
-        srgf=fileio.export_as_srgf,
-        xlsx=fileio.export_as_xlsx,
+    export_options = dict(
+        csv=dict(backend=backend),
+        json=dict(compact=compact),
+        srgf=dict(compact=compact),
+        xlsx=dict(backend=backend),
+    )
+    fileio.export_formats(
+        manager,
+        export,
+        os.getcwd(),
+        options=export_options,
+        parallel=parallel,
     )
-    if 'all' in export:
-        export = ['csv', 'html', 'json', 'md', 'srgf', 'xlsx']
 
-    timestamp = time.strftime('%Y%m%d%H%M%S')
 
-    for format in export:
-        logger.info(f'Exporting gacha data as {format} format')
-        output_dir = os.getcwd()
-        filename = f'HKSR-export-{uid}-{timestamp}.{format}'
-        if format == 'srgf':
-            filename += '.json'
-        path = os.path.join(output_dir, filename)
-        export_hooks[format](manager, path)
-        logger.info(f'Gacha data in {format} format is saved to {path}')
+def read_api_file(api_file: str) -> List[str]:
+    # one api URL per line, blank lines and lines starting with # are ignored
+    with open(api_file, encoding='utf-8') as fin:
+        lines = [line.strip() for line in fin]
+    return [line for line in lines if line and not line.startswith('#')]
+
+
+def sync_all_from_api(
+    api_file: str,
+    workers: int,
+    request_interval: float,
+    incremental: bool = True,
+) -> Dict[str, int]:
+    """
+    Synchronizes the gacha records of several accounts on a worker pool.
+    Requests are rate limited per host, and each account is saved to its
+    own cache.
+
+    Args:
+        api_file (str): A text file of api URLs, one for each account.
+        workers (int): The number of accounts synchronized concurrently.
+        request_interval (float): The minimum interval (seconds) between two
+            requests to the same host.
+        incremental (bool): Whether to stop paging at the newest cached
+            record.
+
+    Returns:
+        Dict[str, int]: The number of new records of each synchronized uid.
+    """
+
+    api_urls = read_api_file(api_file)
+    total = len(api_urls)
+    logger.info(f'Synchronizing {total} accounts with {workers} workers')
+    limiters = HostRateLimiter(interval=request_interval)
+
+    def sync(index, api_url):
+        def on_page(gacha_type, page):
+            logger.info(
+                f'[{index}/{total}] Downloading page {page} of type '
+                f'{gacha_type.name}',
+            )
+
+        manager = sync_gacha(
+            api_url, limiters.get(api_url), incremental, on_page,
+        )
+        new_records = sum(map(len, manager.new_records.values()))
+        return manager.uid, new_records
+
+    results: Dict[str, int] = dict()
+    failed = 0
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        futures = {
+            executor.submit(sync, index, api_url): index
+            for index, api_url in enumerate(api_urls, start=1)
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            index = futures[future]
+            try:
+                uid, new_records = future.result()
+            except Exception:
+                failed += 1
+                logger.error(
+                    f'[{index}/{total}] Synchronization failed '
+                    f'({done}/{total} done). Traceback:',
+                )
+                logger.error(traceback.format_exc())
+                continue
+            results[uid] = results.get(uid, 0) + new_records
+            logger.info(
+                f'[{index}/{total}] Synchronized uid {uid}, '
+                f'{new_records} new records ({done}/{total} done)',
+            )
+    # account records are only updated from this thread, all at once
+    with account_record.transaction():
+        for uid in results:
+            account_record.update_timestamp(uid)
+    logger.info(
+        f'Synchronized {total - failed} of {total} accounts, '
+        f'{failed} failed',
+    )
+    return results
 
 
 def import_srgf_data(filename):
@@ -151,35 +360,11 @@ def import_srgf_data(filename):
         logger.info('Skipping import srgf data')
         return
     try:
-        with open(filename, encoding='utf-8') as f:
-            data = json.load(f)
-        info = data['info']
-        uid = info['uid']
-        update_info = dict(
-            uid=info['uid'],
-            lang=info['lang'],
-            region='',  # unused
-            region_time_zone=str(info['region_time_zone']),
-        )
-        record_cache = defaultdict(list)
-        for item in data['list']:
-            item.update(update_info)
-            record_cache[int(item['gacha_type'])].append(item)
-
-        manager = GachaDataManager(uid=uid)
-        logger.info(f'Successfully connected to cache of uid {uid}')
-        manager.log_stats()
-
-        for k, v in record_cache.items():
-            manager.add_records(k, v)
-            manager.gacha[k].sort()
-
-        fileio.export_as_sql(manager, manager.cache_path)
-
+        info, _ = import_srgf(filename)
         timestamp = info['export_timestamp']
         timestruct = time.localtime(timestamp)
         timestr = time.strftime(babelfish.constants.TIME_FMT, timestruct)
-        account_record.update_timestamp(uid, timestr)
+        account_record.update_timestamp(str(info['uid']), timestr)
 
         logger.info(f'Successfully load gacha data from {filename}')
     except Exception:
@@ -0,0 +1,255 @@
+import codecs
+import datetime
+import json
+import os
+import re
+import time
+from collections import defaultdict
+from typing import IO, Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from starrail.gacha.factory import DatabaseFactory
+from starrail.gacha.parse import get_cache_path
+from starrail.gacha.type import GachaType
+from starrail.utils import loggings
+
+logger = loggings.get_logger(__file__)
+
+whitespace = re.compile(r'\s*')
+gacha_types = {str(gacha_type.value): gacha_type for gacha_type in GachaType}
+ProgressCallback = Callable[[int, int, int], None]
+
+
+class JSONStreamReader:
+    """
+    Reads JSON values one by one from a binary stream, keeping only a small
+    window of the document in memory.
+    """
+
+    def __init__(self, fp: IO[bytes], chunk_size: int = 1 << 16):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.text_decoder = codecs.getincrementaldecoder('utf-8-sig')()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+        self.bytes_read = 0
+
+    def fill(self) -> bool:
+        if self.eof:
+            return False
+        data = self.fp.read(self.chunk_size)
+        self.bytes_read += len(data)
+        self.eof = not data
+        text = self.text_decoder.decode(data, final=self.eof)
+        self.buffer = self.buffer[self.pos:] + text
+        self.pos = 0
+        return not self.eof
+
+    def peek(self) -> str:
+        while True:
+            match = whitespace.match(self.buffer, self.pos)
+            if match is not None:  # always, as it matches ''
+                self.pos = match.end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return ''
+
+    def expect(self, chars: str) -> str:
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError(
+                f'Expecting one of {chars!r} at byte {self.bytes_read}, '
+                f'got {char!r}',
+            )
+        self.pos += 1
+        return char
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                obj, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            # a number may continue in the next chunk
+            if end == len(self.buffer) and self.fill():
+                continue
+            self.pos = end
+            return obj
+
+
+def iter_srgf(
+    fp: IO[bytes],
+    chunk_size: int = 1 << 16,
+) -> Iterator[Tuple[str, Any, int]]:
+    """
+    Parses an SRGF document incrementally.
+
+    Args:
+        fp (IO[bytes]): The SRGF file opened in binary mode.
+        chunk_size (int): The number of bytes read from the file at a time.
+
+    Yields:
+        Tuple[str, Any, int]: For each item of the `list` array, the key
+            `list`, the item and the number of bytes read so far. For other
+            top-level keys (e.g. `info`), the key, its value and the number
+            of bytes read.
+    """
+
+    reader = JSONStreamReader(fp, chunk_size)
+    reader.expect('{')
+    if reader.peek() == '}':
+        return
+    while True:
+        key = reader.value()
+        reader.expect(':')
+        if key == 'list':
+            reader.expect('[')
+            if reader.peek() == ']':
+                reader.pos += 1
+            else:
+                while True:
+                    yield key, reader.value(), reader.bytes_read
+                    if reader.expect(',]') == ']':
+                        break
+        else:
+            yield key, reader.value(), reader.bytes_read
+        if reader.expect(',}') == '}':
+            break
+
+
+def validate_info(info: Any) -> Dict[str, Any]:
+    if not isinstance(info, dict):
+        raise ValueError('Invalid SRGF info: not an object')
+    for key in ('uid', 'lang', 'region_time_zone'):
+        if key not in info:
+            raise ValueError(f'Invalid SRGF info: `{key}` is missing')
+    try:  # numeric strings are written by some exporters
+        info['region_time_zone'] = int(info['region_time_zone'])
+    except (TypeError, ValueError):
+        raise ValueError(
+            'Invalid SRGF info: `region_time_zone` is not an integer',
+        )
+    return info
+
+
+def validate_record(item: Any, index: int) -> Dict[str, str]:
+    """
+    Checks a record of the SRGF `list` against the SRGF v1.0 standard and
+    fills the optional fields with default values.
+    """
+
+    def invalid(reason):
+        return ValueError(f'Invalid SRGF record #{index}: {reason}')
+
+    if not isinstance(item, dict):
+        raise invalid('not an object')
+    for key in ('gacha_id', 'gacha_type', 'item_id', 'time', 'id'):
+        if not isinstance(item.get(key), str):
+            raise invalid(f'`{key}` is missing or not a string')
+    for key in ('count', 'name', 'item_type', 'rank_type'):
+        if key in item and not isinstance(item[key], str):
+            raise invalid(f'`{key}` is not a string')
+    if item['gacha_type'] not in gacha_types:
+        raise invalid(f'unknown gacha_type {item["gacha_type"]}')
+    if not item['id'].isdigit():
+        raise invalid(f'`id` {item["id"]} is not numeric')
+    if not item.get('rank_type', '').isdigit():
+        raise invalid('`rank_type` is missing or not numeric')
+    try:
+        datetime.datetime.fromisoformat(item['time'])
+    except ValueError:
+        raise invalid(f'`time` {item["time"]} is not a valid time')
+    item.setdefault('count', '1')
+    item.setdefault('name', '')
+    item.setdefault('item_type', '')
+    return item
+
+
+def import_srgf(
+    path: str,
+    batch_size: int = 1000,
+    on_progress: Optional[ProgressCallback] = None,
+) -> Tuple[Dict[str, Any], int]:
+    """
+    Imports an SRGF file into the cache of its account. The file is parsed
+    and validated record by record, and records are written to the database
+    in batches of `batch_size`, so memory usage does not grow with the size
+    of the file. Records already in the cache are skipped.
+
+    Args:
+        path (str): The path of the SRGF file.
+        batch_size (int): The number of records written in a transaction.
+        on_progress (Callable, optional): Called after each batch with the
+            number of records read, the number of bytes read and the size of
+            the file.
+
+    Returns:
+        Tuple[Dict[str, Any], int]: The SRGF info and the number of records
+            in the file.
+    """
+
+    size = os.path.getsize(path)
+    info: Optional[Dict[str, Any]] = None
+    extra_info: Dict[str, str] = dict()
+    batches: Dict[str, List[Dict[str, str]]] = defaultdict(list)
+    pending, total, inserted = 0, 0, 0
+    db = None
+
+    def flush(position):
+        nonlocal pending, inserted
+        for gacha_type, records in batches.items():
+            inserted += db.add_entries(
+                gacha_types[gacha_type].name, records, skip_existing=True,
+            )
+        batches.clear()
+        pending = 0
+        logger.info(
+            f'Imported {total} records of uid {info["uid"]} '
+            f'({position}/{size} bytes)',
+        )
+        if on_progress is not None:
+            on_progress(total, position, size)
+
+    try:
+        with open(path, 'rb') as fin:
+            for key, value, position in iter_srgf(fin):
+                if key == 'info':
+                    info = validate_info(value)
+                    extra_info = dict(
+                        uid=str(info['uid']),
+                        lang=info['lang'],
+                        region='',  # unused
+                        region_time_zone=str(info['region_time_zone']),
+                    )
+                    cache_path = get_cache_path(extra_info['uid'])
+                    db = DatabaseFactory.get_database(cache_path)
+                    for records in batches.values():
+                        for record in records:
+                            record.update(extra_info)
+                elif key == 'list':
+                    record = validate_record(value, total)
+                    record.update(extra_info)
+                    batches[record['gacha_type']].append(record)
+                    total += 1
+                    pending += 1
+                    if db is None and pending == batch_size:
+                        logger.warning(
+                            'SRGF info is located after the list, records '
+                            'are kept in memory until it is read',
+                        )
+                    if db is not None and pending >= batch_size:
+                        flush(position)
+        if info is None:
+            raise ValueError('Invalid SRGF file: `info` is missing')
+        flush(size)
+    finally:
+        if db is not None:
+            db.close()
+    logger.info(f'{inserted} of {total} records are new')
+    info.setdefault('export_timestamp', int(time.time()))
+    return info, total
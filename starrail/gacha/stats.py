@@ -0,0 +1,114 @@
+import time
+from typing import Any, Dict, List, Sequence
+
+from starrail.utils.babelfish.dictionary import record_type_mapping
+
+pity_ranks = ('5', '4')
+report_ranks = ('5', '4', '3')
+
+
+def summarize(records: Sequence[Dict[str, str]]) -> Dict[str, Any]:
+    """
+    Computes the statistics of gacha records in a single pass.
+
+    Args:
+        records (Sequence[Dict[str, str]]): The gacha records of one gacha
+            type, sorted from the newest to the oldest.
+
+    Returns:
+        Dict[str, Any]: A dictionary with two items, `ranks` is a list of
+            statistics for each rank (the format of `GachaDataList.stats`),
+            and `overview` is the statistics displayed in graphic mode (the
+            format of `GachaDataList.stats_v2`).
+    """
+
+    rank_counts = {rank: 0 for rank in report_ranks}
+    type_counts: Dict[str, int] = dict()
+    pities = {rank: 0 for rank in pity_ranks}
+    attempts: Dict[str, List] = {rank: [] for rank in pity_ranks}
+
+    for item in reversed(records):  # from the oldest to the newest
+        rank_type = item['rank_type']
+        rank_counts[rank_type] = rank_counts.get(rank_type, 0) + 1
+        item_type = item['item_type']
+        item_type = record_type_mapping.get(item_type, item_type)
+        key = f'{item_type}{rank_type}'
+        type_counts[key] = type_counts.get(key, 0) + 1
+        for rank in pity_ranks:
+            pities[rank] += 1
+        if rank_type in pities:
+            attempts[rank_type].append((item['name'], pities[rank_type]))
+            pities[rank_type] = 0
+
+    total = len(records)
+    ranks = [
+        rank_stats(rank, rank_counts[rank], total, pities, attempts)
+        for rank in report_ranks
+    ]
+    overview = overview_stats(records, type_counts, pities, attempts)
+    return dict(ranks=ranks, overview=overview)
+
+
+def rank_stats(rank_type, count, total, pities, attempts):
+    if not total or not count:
+        return dict(
+            rank_type=rank_type,
+            count='0',
+            basic_prob='',
+            compr_prob='',
+            since_last=f'{total}',
+            attempts=[],
+            average='',
+        )
+    if rank_type not in pities:
+        return dict(
+            rank_type=rank_type,
+            count=f'{count}',
+            basic_prob=f'{count / total:.2%}',
+            compr_prob='',
+            since_last='',
+            attempts=[],
+            average='',
+        )
+    since_last = pities[rank_type]
+    return dict(
+        rank_type=rank_type,
+        count=f'{count}',
+        basic_prob=f'{count / total:.2%}',
+        compr_prob=f'{count / (total - since_last):.2%}',
+        since_last=f'{since_last}',
+        attempts=[
+            f'{name}@{times}' for name, times in reversed(attempts[rank_type])
+        ],
+        average=f'{(total - since_last) / count:.2f}',
+    )
+
+
+def overview_stats(records, type_counts, pities, attempts):
+    if not records:
+        today = time.strftime('%y.%m.%d')
+        start_time = end_time = today
+    else:
+        start_time = records[-1]['time'].split()[0].replace('-', '.')
+        end_time = records[0]['time'].split()[0].replace('-', '.')
+    five_stars = [(name, times, False) for name, times in attempts['5']]
+    if not five_stars:
+        average_up = average_5 = 0
+    else:
+        average_5 = sum([it[1] for it in five_stars]) / len(five_stars)
+        ups = list(filter(lambda it: it[-1], five_stars))
+        average_up = sum([it[1] for it in ups]) / len(ups) if ups else 0
+    return dict(
+        character5=type_counts.get('character5', 0),
+        character4=type_counts.get('character4', 0),
+        lightcone5=type_counts.get('lightcone5', 0),
+        lightcone4=type_counts.get('lightcone4', 0),
+        lightcone3=type_counts.get('lightcone3', 0),
+        total=len(records),
+        since_last=pities['5'] if records else 0,
+        average_up=average_up,
+        average_5=average_5,
+        start_time=start_time,
+        end_time=end_time,
+        five_stars=five_stars,
+    )
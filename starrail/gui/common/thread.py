@@ -1,28 +1,53 @@
 import traceback
+from typing import Optional
 
-from PySide6.QtCore import QThread, Signal
+from PySide6.QtCore import QObject, Signal
 
 from starrail.utils import babelfish, loggings
+from starrail.utils.schedule import Job, get_scheduler
 
 logger = loggings.get_logger(__file__)
 
 
-class StatefulThread(QThread):
+class StatefulThread(QObject):
+    """
+    A background task of the GUI, run by the shared scheduler under the job
+    name `jobName`, which defaults to the class name. While a task is
+    running, starting another one of the same name returns False without
+    running it or emitting any signal, so the receivers of the running task
+    are left alone and the caller restores its UI instead. Signals emitted
+    by `work` are delivered to the receivers in the UI thread.
+    """
 
     successSignal = Signal(str)
     failureSignal = Signal(str)
 
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, jobName: Optional[str] = None):
         super().__init__(parent=parent)
+        self.jobName = jobName or type(self).__name__
+        self.job: Optional[Job] = None
+
+    def start(self) -> bool:
+        self.job = get_scheduler().submit(self.jobName, self.run)
+        if self.job is None:
+            logger.warning(f'{self.jobName} is already running')
+            return False
+        return True
+
+    def isRunning(self) -> bool:
+        return self.job is not None and not self.job.future.done()
 
     def run(self):
         try:
             msg = self.work()
             self.successSignal.emit(msg)
-        except Exception:
+        except Exception as e:
             logger.error(traceback.format_exc())
-            msg = f'{babelfish.ui_traceback()}:\n{traceback.format_exc()}'
-            self.failureSignal.emit(msg)
+            self.failureSignal.emit(self.failureMessage(e))
 
     def work(self):
         raise NotImplementedError
+
+    def failureMessage(self, error: Exception) -> str:
+        # the message shown for an exception raised by `work`
+        return f'{babelfish.ui_traceback()}:\n{traceback.format_exc()}'
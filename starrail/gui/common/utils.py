@@ -43,3 +43,16 @@ def checkUpdate(parent, show_success=False, show_failure=True):
             )
             dialog.show()
             dialog.raise_()
+
+
+def showTaskRunning(parent):
+    # shown when a task is not started as another one of it is running
+    qfw.InfoBar.warning(
+        title=babelfish.ui_task_running(),
+        content='',
+        orient=Qt.Orientation.Horizontal,
+        isClosable=True,
+        duration=3000,
+        position=qfw.InfoBarPosition.TOP_RIGHT,
+        parent=parent,
+    )
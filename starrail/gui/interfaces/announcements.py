@@ -1,22 +1,83 @@
 import json
 import re
+from typing import Iterable
 
 import qfluentwidgets as qfw
 from PySide6 import QtCore, QtGui, QtWidgets
 
+from starrail.config import configuration as cfg
 from starrail.gui.common.stylesheet import StyleSheet
 from starrail.gui.common.thread import StatefulThread
 from starrail.gui.interfaces.base import BaseInterface
 from starrail.mihoyo import api
+from starrail.utils import loggings
+from starrail.utils.cache import LRUCache
 from starrail.utils.download import download
+from starrail.utils.schedule import Scheduler
 
 AF = QtCore.Qt.AlignmentFlag
+logger = loggings.get_logger(__file__)
+
+
+class BannerLoader(QtCore.QObject):
+    """
+    Downloads and decodes banners on a scheduler of its own, one job for
+    each banner, so a banner is never loaded twice at once and a burst of
+    banners never delays the tasks started by the user. Decoded images are
+    kept in an LRU cache so that showing a banner on the UI thread never
+    needs disk or network I/O.
+    """
+
+    bannerReady = QtCore.Signal(str)
+
+    def __init__(self, max_size=64, parent=None):
+        super().__init__(parent=parent)
+        self.images = LRUCache(max_size=max_size)
+        self.scheduler = Scheduler(
+            max_workers=cfg.banner_workers, name='banner',
+        )
+        app = QtCore.QCoreApplication.instance()
+        if app is not None:
+            app.aboutToQuit.connect(self.shutdown)
+
+    def image(self, url: str):
+        # QImage, unlike QPixmap, can be created outside the UI thread
+        return self.images.get(url)
+
+    def request(self, url: str):
+        if not url or url in self.images:
+            return
+        self.scheduler.submit(url, self.load, url)
+
+    def shutdown(self):
+        self.scheduler.shutdown(wait=False)
+
+    def prefetch(self, urls: Iterable[str]):
+        for url in urls:
+            self.request(url)
+
+    def load(self, url: str):
+        try:
+            data, _ = download(url)
+            image = QtGui.QImage()
+            if image.loadFromData(data):
+                self.images.set(url, image)
+                # queued to the receivers in the UI thread
+                self.bannerReady.emit(url)
+            else:
+                logger.warning(f'Failed to decode banner {url}')
+        except Exception:
+            logger.exception(f'Failed to load banner {url}')
 
 
 class UpdateAnnouncementsThread(StatefulThread):
 
     annInfoReady = QtCore.Signal(str)
 
+    def __init__(self, bannerLoader: BannerLoader, parent=None):
+        super().__init__(parent=parent)
+        self.bannerLoader = bannerLoader
+
     def work(self):
         content, cache = download(api.announcements, cached=False)
         if not cache:
@@ -25,8 +86,9 @@ class UpdateAnnouncementsThread(StatefulThread):
 
         content = content.decode('utf-8', errors='ignore')
         content = json.loads(content)
-        for item in content['data']['list']:
-            download(item['banner'])  # pre-download
+        self.bannerLoader.prefetch(
+            item['banner'] for item in content['data']['list']
+        )
 
 
 def filterHtml(html: str):
@@ -60,6 +122,9 @@ class AnnouncementsInterface(BaseInterface):
         self.browser.anchorClicked.connect(self.onHrefAnchorClicked)
 
         self.updateThread = None
+        self.bannerLoader = BannerLoader(parent=self)
+        self.bannerLoader.bannerReady.connect(self.onBannerReady)
+        self.currentBanner = ''
         self.urlPattern = re.compile(r'^(https?)://[^\s/$.?#].[^\s]*$')
 
         self.__initWidget()
@@ -89,9 +154,12 @@ class AnnouncementsInterface(BaseInterface):
         self.annList.itemClicked.connect(self.onListItemClicked)
 
     def updateAnnouncements(self):
-        self.updateThread = UpdateAnnouncementsThread(self)
-        self.updateThread.annInfoReady.connect(self.announceInfoReadySlot)
-        self.updateThread.start()
+        updateThread = UpdateAnnouncementsThread(self.bannerLoader, self)
+        updateThread.annInfoReady.connect(self.announceInfoReadySlot)
+        if updateThread.start():
+            self.updateThread = updateThread
+        else:  # the running update fills the list once done
+            updateThread.deleteLater()
 
     def announceInfoReadySlot(self, path):
         self.annList.clear()
@@ -107,17 +175,28 @@ class AnnouncementsInterface(BaseInterface):
     def onListItemClicked(self, item: AnnouncementItem):
         self.browser.setHtml(filterHtml(item.annData['content']))
         self.annTitleLabel.setText(item.annData['title'])
-        if item.annData['banner']:
-            data, _ = download(item.annData['banner'])
-            pixmap = QtGui.QPixmap()
-            success = pixmap.loadFromData(data)
-            aspectRatio = pixmap.height() / (pixmap.width() + 1e-6)
-            if success:
-                self.bannerLabel.setPixmap(pixmap)
-                # width = self.browser.width()
-                width = self.width() - self.annList.width() - 72
-                height = int(width * aspectRatio)
-                self.bannerLabel.setFixedSize(width, height)
+        self.currentBanner = item.annData['banner']
+        if self.currentBanner:
+            image = self.bannerLoader.image(self.currentBanner)
+            if image is not None:
+                self.showBanner(image)
+            else:  # shown by onBannerReady once loaded
+                self.bannerLoader.request(self.currentBanner)
+
+    def onBannerReady(self, url: str):
+        if url == self.currentBanner:
+            image = self.bannerLoader.image(url)
+            if image is not None:
+                self.showBanner(image)
+
+    def showBanner(self, image: QtGui.QImage):
+        pixmap = QtGui.QPixmap.fromImage(image)
+        aspectRatio = pixmap.height() / (pixmap.width() + 1e-6)
+        self.bannerLabel.setPixmap(pixmap)
+        # width = self.browser.width()
+        width = self.width() - self.annList.width() - 72
+        height = int(width * aspectRatio)
+        self.bannerLabel.setFixedSize(width, height)
 
     def onHrefAnchorClicked(self, qurl: QtCore.QUrl):
         self.browser.setSource(QtCore.QUrl())
@@ -1,7 +1,6 @@
 import json
 import os
 import time
-from collections import defaultdict
 
 import qfluentwidgets as qfw
 from PySide6 import QtCharts, QtWidgets
@@ -14,10 +13,12 @@ from starrail.gacha.type import GachaType
 from starrail.gui.common.icon import Icon
 from starrail.gui.common.stylesheet import StyleSheet
 from starrail.gui.common.thread import StatefulThread
+from starrail.gui.common.utils import showTaskRunning
 from starrail.gui.interfaces.base import BaseInterface, CardWidget
 from starrail.gui.widgets.pie_chart import SmartPieChart
 from starrail.utils import babelfish, loggings
 from starrail.utils.accounts import account_record, get_latest_uid
+from starrail.utils.ratelimit import TokenBucket
 
 AF = Qt.AlignmentFlag
 logger = loggings.get_logger(__file__)
@@ -37,116 +38,52 @@ class GachaSyncThread(StatefulThread):
         logger.log(level=level, msg=f'[GUI] {message}')
         self.syncStateSignal.emit(message)
 
-    def exportGachaType(self, api_template, gacha_type, request_interval):
-        r = []
-        end_id = '0'
-        for page in service.integers():
-            self.logAndUpdateState(
-                babelfish.ui_downloading_gacha(
-                    name=babelfish.translate(gacha_type.name),
-                    page=page,
-                ),
-            )
-            api_url = service.get_api_url(
-                api_template, end_id, str(gacha_type.value),
-                str(page), '20',
-            )
-            logger.debug(f'Requesting {api_url}')
-            response, code = service.fetch_json(api_url)
-            time.sleep(request_interval)
-            _, should_stop, msg = service.check_response(response, code)
-            logger.info(f'check_response: {msg}')
-            if should_stop:
-                break
-            data_list = response['data']['list']
-            region = response['data']['region']
-            timezone = response['data']['region_time_zone']
-            metainfo = dict(region=region, region_time_zone=timezone)
-            for data_item in data_list:
-                data_item.update(metainfo)
-            r.extend(data_list)
-            end_id = data_list[-1]['id']
-        return r
+    def onPageRequested(self, gacha_type, page):
+        self.logAndUpdateState(
+            babelfish.ui_downloading_gacha(
+                name=babelfish.translate(gacha_type.name),
+                page=page,
+            ),
+        )
 
     def work(self):
         self.logAndUpdateState(babelfish.ui_extracting_api_url())
         api_url = self.api_url or service.detect_api_url()
-        response, code = service.fetch_json(api_url)
-        valid, _, msg = service.check_response(response, code)
-        logger.info(f'check_response (api): {msg}')
-        if not valid:
-            self.failureSignal.emit(babelfish.ui_extract_api_fail())
-            raise ValueError(babelfish.ui_extract_api_fail_with_msg(msg))
-
-        api_template = service.get_url_template(api_url)
-        record_cache = dict()
-
-        for gacha_type in service.GachaType:
-            records = self.exportGachaType(
-                api_template,
-                gacha_type,
-                0.15,
-            )
-            record_cache[gacha_type.value] = records
-            logger.info(f'Finish downloading records of {gacha_type.name}')
-
-        uid = service.deduce_uid(record_cache)
-        if not uid:
-            logger.critical(
-                'Cannot deduce uid from records, there may be no '
-                'record. Please check and try again.',
-            )
-            raise ValueError(babelfish.ui_deduce_uid_fail())
-        manager = service.GachaDataManager(uid)
-        logger.info(f'Successfully connected to cache of uid {uid}')
-        manager.log_stats()
-
-        for gacha_type in service.GachaType:
-            manager.add_records(
-                gacha_type.value, record_cache[gacha_type.value],
-            )
-            manager.gacha[gacha_type.value].sort()
-
-        service.fileio.export_as_sql(manager, manager.cache_path)
+        manager = service.sync_gacha(
+            api_url,
+            TokenBucket(interval=0.15),
+            on_page=self.onPageRequested,
+        )
         manager.log_stats()
+        return manager.uid
 
-        return uid
+    def failureMessage(self, error):
+        if isinstance(error, service.InvalidApiError):
+            return babelfish.ui_extract_api_fail_with_msg(error.reason)
+        if isinstance(error, service.UidNotFoundError):
+            return babelfish.ui_deduce_uid_fail()
+        return super().failureMessage(error)
 
 
 class RecordImportThread(StatefulThread):
 
+    progressSignal = Signal(str)
+
     def __init__(self, path, parent=None):
         super().__init__(parent=parent)
         self.path = path
 
-    def work(self):
-        with open(self.path, encoding='utf-8') as f:
-            data = json.load(f)
-        info = data['info']
-        uid = info['uid']
-        update_info = dict(
-            uid=info['uid'],
-            lang=info['lang'],
-            region='',  # unused
-            region_time_zone=str(info['region_time_zone']),
+    def onProgress(self, count, position, size):
+        percent = position * 100 // size if size else 100
+        self.progressSignal.emit(
+            babelfish.ui_loading_gacha_progress(cnt=count, percent=percent),
         )
-        record_cache = defaultdict(list)
-        for item in data['list']:
-            item.update(update_info)
-            record_cache[int(item['gacha_type'])].append(item)
-
-        manager = service.GachaDataManager(uid=uid)
-        logger.info(f'Successfully connected to cache of uid {uid}')
-        manager.log_stats()
-
-        total = 0
 
-        for k, v in record_cache.items():
-            manager.add_records(k, v)
-            manager.gacha[k].sort()
-            total += len(v)
-
-        service.fileio.export_as_sql(manager, manager.cache_path)
+    def work(self):
+        info, total = service.import_srgf(
+            self.path, on_progress=self.onProgress,
+        )
+        uid = str(info['uid'])
 
         timestamp = info['export_timestamp']
         timestruct = time.localtime(timestamp)
@@ -168,22 +105,9 @@ class RecordExportThread(StatefulThread):
 
     def work(self):
         manager = service.GachaDataManager(self.uid)
-        export_hooks = dict(
-            csv=service.fileio.export_as_csv,
-            html=service.fileio.export_as_html,
-            json=service.fileio.export_as_json,
-            md=service.fileio.export_as_md,
-            srgf=service.fileio.export_as_srgf,
-            xlsx=service.fileio.export_as_xlsx,
+        service.fileio.export_formats(
+            manager, ['all'], self.path, parallel=True,
         )
-        timestamp = time.strftime('%Y%m%d%H%M%S')
-        for format, hook in export_hooks.items():
-            if format == 'srgf':
-                format = 'srgf.json'
-            filename = f'HKSR-export-{self.uid}-{timestamp}.{format}'
-            export_path = os.path.join(self.path, filename)
-            hook(manager, export_path)
-
         return self.path
 
 # = UI =
@@ -458,6 +382,7 @@ class GachaSyncInterface(BaseInterface):
         self.syncToolTip = None
         self.saveThread = None
         self.loadThread = None
+        self.loadToolTip = None
 
         self.uid = get_latest_uid()
         logger.info(f'Detected current uid: {self.uid}')
@@ -530,6 +455,8 @@ class GachaSyncInterface(BaseInterface):
     def resizeEvent(self, e):
         if self.syncToolTip:
             self.syncToolTip.move(self.syncToolTip.getSuitablePos())
+        if self.loadToolTip:
+            self.loadToolTip.move(self.loadToolTip.getSuitablePos())
         return super().resizeEvent(e)
 
     def disableButtons(self):
@@ -572,7 +499,12 @@ class GachaSyncInterface(BaseInterface):
         )
         self.syncThread.successSignal.connect(self.syncSuccessSlot)
         self.syncThread.failureSignal.connect(self.syncFailureSlot)
-        self.syncThread.start()
+        if not self.syncThread.start():
+            self.syncToolTip.close()
+            self.syncToolTip = None
+            self.syncThread = None
+            self.enableButtons()
+            showTaskRunning(self)
 
     def onSaveButtonClicked(self):
         logger.info('[GUI] Start gacha data exporting')
@@ -586,7 +518,10 @@ class GachaSyncInterface(BaseInterface):
             self.saveThread = RecordExportThread(self.uid, path, self)
             self.saveThread.successSignal.connect(self.saveSuccessSlot)
             self.saveThread.failureSignal.connect(self.saveFailureSlot)
-            self.saveThread.start()
+            if not self.saveThread.start():
+                self.saveThread = None
+                self.enableButtons()
+                showTaskRunning(self)
         else:
             self.enableButtons()
 
@@ -602,10 +537,24 @@ class GachaSyncInterface(BaseInterface):
             filter='JSON Files (*.json);;All Files (*)',
         )
         if path:
+            self.loadToolTip = qfw.StateToolTip(
+                babelfish.ui_loading_gacha(), '', self.window(),
+            )
+            self.loadToolTip.move(self.loadToolTip.getSuitablePos())
+            self.loadToolTip.show()
+
             self.loadThread = RecordImportThread(path=path, parent=self)
+            self.loadThread.progressSignal.connect(
+                lambda s: self.setToolTipContentSlot(self.loadToolTip, s),
+            )
             self.loadThread.successSignal.connect(self.loadSuccessSlot)
             self.loadThread.failureSignal.connect(self.loadFailureSlot)
-            self.loadThread.start()
+            if not self.loadThread.start():
+                self.loadToolTip.close()
+                self.loadToolTip = None
+                self.loadThread = None
+                self.enableButtons()
+                showTaskRunning(self)
         else:
             self.enableButtons()
 
@@ -687,8 +636,16 @@ class GachaSyncInterface(BaseInterface):
 
         self.enableButtons()
 
+    def closeLoadToolTip(self, title: str):
+        if self.loadToolTip is not None:
+            self.loadToolTip.setTitle(title)
+            self.loadToolTip.setContent('')
+            self.loadToolTip.setState(True)
+            self.loadToolTip = None
+
     def loadSuccessSlot(self, msg):
         self.loadThread = None
+        self.closeLoadToolTip(babelfish.ui_load_success())
         msg = json.loads(msg)
         self.uid = msg['uid']
 
@@ -707,6 +664,7 @@ class GachaSyncInterface(BaseInterface):
 
     def loadFailureSlot(self, msg):
         self.loadThread = None
+        self.closeLoadToolTip(babelfish.ui_load_failure())
 
         qfw.InfoBar.error(
             title=babelfish.ui_load_failure(),
@@ -1,6 +1,8 @@
+import itertools
 import json
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from functools import partial
 from typing import Dict, List
 
@@ -9,6 +11,7 @@ from PySide6 import QtWidgets
 from PySide6.QtGui import QPaintEvent
 
 from starrail.gui.common.thread import StatefulThread
+from starrail.gui.common.utils import showTaskRunning
 from starrail.gui.interfaces.base import BaseInterface
 from starrail.gui.widgets.dialog import (
     DialogMode, MaskDialog, QrcodeLoginDialog,
@@ -19,10 +22,17 @@ from starrail.utils import babelfish
 from starrail.utils.accounts import account_record as ar
 
 
+_login_ids = itertools.count(1)
+
+
 class ConnectToHoyolabThread(StatefulThread):
 
     def __init__(self, role_id: str, dialog: QrcodeLoginDialog, parent=None):
-        super().__init__(parent=parent)
+        # one job for each dialog, as a canceled login may still be polling
+        super().__init__(
+            parent=parent,
+            jobName=f'ConnectToHoyolabThread-{next(_login_ids)}',
+        )
         self.role_id = role_id
         self.dialog = dialog
         self.stop_event = threading.Event()
@@ -86,23 +96,32 @@ class ConnectToHoyolabThread(StatefulThread):
         userinfo['aid'] = payload['uid']
         userinfo['game_token'] = payload['token']
 
-        cookie_token = self.client.get_cookie_token_by_game_token(
+        cookie_token, stoken = self.get_tokens(
             game_token=userinfo['game_token'],
             aid=userinfo['aid'],
             device_id=userinfo['device_id'],
         )
         userinfo['cookie_token'] = cookie_token
-
-        stoken = self.client.get_stoken_by_game_token(
-            game_token=userinfo['game_token'],
-            aid=userinfo['aid'],
-            device_id=userinfo['device_id'],
-        )
         userinfo['v2stoken'] = stoken['stoken']
         userinfo['mid'] = stoken['mid']
 
         return userinfo
 
+    def get_tokens(self, game_token: str, aid: str, device_id: str):
+        # both tokens are only derived from the game token, so they are
+        # requested in parallel
+        requests = [
+            self.client.get_cookie_token_by_game_token,
+            self.client.get_stoken_by_game_token,
+        ]
+        with ThreadPoolExecutor(max_workers=len(requests)) as executor:
+            return list(executor.map(
+                lambda request: request(
+                    game_token=game_token, aid=aid, device_id=device_id,
+                ),
+                requests,
+            ))
+
     def bind_user_info(self, userinfo: Dict[str, str]):
         game_record = self.client.get_game_record_card(
             cookie_token=userinfo['cookie_token'],
@@ -252,6 +271,10 @@ class UserItemWidget(QtWidgets.QWidget):
         ar.latest_uid = self.uid
 
     def __onConnectButtonClicked(self):
+        if self.connectToHoyolabThread is not None:
+            # the previous login stops polling at its next check
+            self.connectToHoyolabThread.stop_event.set()
+
         dialog = QrcodeLoginDialog(parent=self.window())
 
         self.connectToHoyolabThread = ConnectToHoyolabThread(
@@ -259,7 +282,11 @@ class UserItemWidget(QtWidgets.QWidget):
             dialog,
             self,
         )
-        self.connectToHoyolabThread.start()
+        if not self.connectToHoyolabThread.start():
+            self.connectToHoyolabThread = None
+            dialog.deleteLater()
+            showTaskRunning(self.window())
+            return
 
         dialog.worker = self.connectToHoyolabThread
 
@@ -1,18 +1,25 @@
 import functools
 import random
+import threading
 import time
 import traceback
 import uuid
-from typing import Any, Callable, Dict, Hashable, Optional
+from typing import Callable, Dict, Optional
 from urllib.parse import parse_qs, urlparse
 
 import requests
 
+from starrail.config import configuration as cfg
 from starrail.mihoyo import api, dynamic_secret
 from starrail.utils import loggings
+from starrail.utils.cache import PersistentExpirableCache
+from starrail.utils.session import get_session
 
 logger = loggings.get_logger(__file__)
 
+_device_fp_cache: Optional[PersistentExpirableCache] = None
+_device_fp_cache_lock = threading.Lock()
+
 
 def enter(prefix: str = '[HoyolabClient]') -> Callable:
     """
@@ -57,27 +64,21 @@ def random_hexstring(length: int) -> str:
     return ''.join(random.choice(hexdigits) for _ in range(length))
 
 
-class ExpirableCache:
-
-    def __init__(self, expires: float):
-        self.expires = expires
-        self.cache_data: Dict[Hashable, Dict[str, Any]] = dict()
-
-    def set(self, key: Hashable, value: Any):
-        curr_time = time.time()
-        expire_time = curr_time + self.expires
-        self.cache_data[key] = dict(
-            expire_time=expire_time,
-            data=value,
-        )
+def get_device_fp_cache() -> PersistentExpirableCache:
+    """
+    Returns the device fingerprint cache, which is loaded from disk once, so
+    that fingerprints are reused across runs until they expire.
+    """
 
-    def get(self, key: Hashable) -> Any:
-        if key in self.cache_data:
-            curr_time = time.time()
-            expire_time = self.cache_data[key]['expire_time']
-            if curr_time < expire_time:
-                return self.cache_data[key]['data']
-        return None
+    global _device_fp_cache
+    with _device_fp_cache_lock:
+        if _device_fp_cache is None:
+            _device_fp_cache = PersistentExpirableCache(
+                cfg.device_fp_cache_path,
+                expires=cfg.device_fp_expires,
+                max_size=256,
+            )
+        return _device_fp_cache
 
 
 class HoyolabClient:
@@ -86,7 +87,8 @@ class HoyolabClient:
 
     user_agent = 'Mozilla/5.0 (Windows NT 11.0; Win64; x64) miHoYoBBS/2.67.1'
 
-    device_fp_cache = ExpirableCache(expires=300.0)
+    def __init__(self, session: Optional[requests.Session] = None):
+        self.session = session
 
     def request_json(
         self,
@@ -98,7 +100,8 @@ class HoyolabClient:
         timeout=None,
     ):
         logger.debug(f'requesting json: {url}')
-        response = requests.request(
+        session = self.session or get_session()
+        response = session.request(
             method=method,
             url=url,
             params=params,
@@ -219,15 +222,22 @@ class HoyolabClient:
         )
 
     def get_cached_device_fp(self, device_id: str) -> str:
-        fp = HoyolabClient.device_fp_cache.get(device_id)
+        cache = get_device_fp_cache()
+        fp = cache.get(device_id)
         if fp is not None:
             return str(fp)  # for type annotation compatibility
-        fp = self.get_device_fingerprint(device_id=device_id)
-        HoyolabClient.device_fp_cache.set(device_id, fp)
+        fp = self.request_device_fingerprint(device_id=device_id)
+        if fp is None:  # the fallback is not cached, to retry next time
+            return random_hexstring(13)
+        cache.set(device_id, fp)
         return fp
 
-    @enter()
     def get_device_fingerprint(self, device_id: str) -> str:
+        fp = self.request_device_fingerprint(device_id=device_id)
+        return random_hexstring(13) if fp is None else fp
+
+    @enter()
+    def request_device_fingerprint(self, device_id: str) -> Optional[str]:
         headers = {
             'Origin': 'https://webstatic.mihoyo.com/',
             'Referer': 'https://webstatic.mihoyo.com/',
@@ -278,7 +288,7 @@ class HoyolabClient:
             return payload['data']['device_fp']
         except Exception:
             logger.error(traceback.format_exc())
-            return random_hexstring(13)
+            return None
 
     @enter()
     def get_multi_token_by_login_ticket(
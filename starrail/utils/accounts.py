@@ -1,12 +1,20 @@
+import atexit
 import json
 import os
+import sqlite3
+import threading
 import time
-from typing import Dict
+import traceback
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
 
 import easydict
 
 from starrail.config import configuration as cfg
-from starrail.utils import babelfish, security
+from starrail.utils import babelfish, loggings, security
+from starrail.utils.misc import atomic_write
+
+logger = loggings.get_logger(__file__)
 
 
 def todict(d, keys):
@@ -27,19 +35,55 @@ def todict(d, keys):
     return {k: d[k] for k in d if k in keys}
 
 
+def encrypt_secrets(secrets: Dict[str, str]) -> Tuple[str, bytes]:
+    """
+    Encrypts the secrets of an account.
+
+    Returns:
+        Tuple[str, bytes]: The base64 encoded iv and the encrypted secrets.
+    """
+
+    iv, encrypted = security.AES192.encrypt(
+        json.dumps(secrets), security.token_aes128_key16b,
+    )
+    return security.Base64.encode(iv), encrypted
+
+
+def decrypt_secrets(iv: str, encrypted: bytes) -> Dict[str, str]:
+    """
+    Decrypts the secrets of an account encrypted by `encrypt_secrets`.
+    """
+
+    secret_str = security.AES192.decrypt(
+        encrypted, security.token_aes128_key16b, security.Base64.decode(iv),
+    )
+    return json.loads(secret_str)
+
+
 class AccountRecord:
+    """
+    The accounts and their properties, stored in a JSON file. Changes are
+    written behind: they are coalesced and saved `flush_delay` seconds after
+    the first of them, at the end of the outermost `transaction()`, or at
+    exit at the latest.
+    """
 
     # callbacks
     latest_uid_changed = None
     accounts_changed = None
 
-    def __init__(self, path):
+    def __init__(self, path, flush_delay: float = 1.0):
         self._path = path
+        self.flush_delay = flush_delay
+        self.lock = threading.RLock()
+        self.dirty = False
+        self.timer: Optional[threading.Timer] = None
+        self.transaction_depth = 0
         cache = self.safe_load()
         self.meta = cache['meta']
         self.accounts = cache['accounts']
-        self.secrets = dict()
         self.init_keys()
+        atexit.register(self.flush)
 
     def init_keys(self, keys=('last_update', 'iv')):
         keys_set = set(keys)
@@ -51,7 +95,8 @@ class AccountRecord:
                 del self.accounts[uid][del_key]
             for add_key in add_keys_set:
                 self.accounts[uid][add_key] = ''
-        self.flush()
+            if del_keys_set or add_keys_set:
+                self.mark_dirty()
 
     def safe_load(self):
         try:
@@ -64,34 +109,86 @@ class AccountRecord:
                 accounts=dict(),
             )
 
+    def mark_dirty(self):
+        """
+        Records that there are unsaved changes, and schedules a flush unless
+        a transaction is in progress or a flush is already scheduled.
+        """
+
+        with self.lock:
+            self.dirty = True
+            if self.transaction_depth or self.timer is not None:
+                return
+            self.timer = threading.Timer(self.flush_delay, self.delayed_flush)
+            self.timer.daemon = True  # flushed by atexit otherwise
+            self.timer.start()
+
+    def delayed_flush(self):
+        with self.lock:
+            self.timer = None
+            # saved when the transaction ends otherwise
+            if not self.transaction_depth:
+                self.flush()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Defers saving the changes made within the context, which are saved
+        at once when the outermost transaction ends.
+        """
+
+        with self.lock:
+            self.transaction_depth += 1
+        try:
+            yield self
+        finally:
+            with self.lock:
+                self.transaction_depth -= 1
+                if not self.transaction_depth:
+                    self.flush()
+
     def flush(self):
-        dirname = os.path.dirname(self._path)
-        os.makedirs(dirname, exist_ok=True)
-        with open(self._path, 'w', encoding='utf-8') as f:
-            json.dump(
-                dict(meta=self.meta, accounts=self.accounts), f,
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            if not self.dirty:
+                return
+            content = json.dumps(
+                dict(meta=self.meta, accounts=self.accounts),
                 ensure_ascii=False, indent=2,
             )
+            try:
+                dirname = os.path.dirname(self._path)
+                os.makedirs(dirname, exist_ok=True)
+                atomic_write(self._path, content)
+                self.dirty = False
+            except OSError:
+                logger.error(traceback.format_exc())
 
     def add_account(self, uid: str):
         uid = str(uid)
-        if uid not in self.accounts:
+        with self.lock:
+            if uid in self.accounts:
+                return
             self.accounts[uid] = dict(
                 last_update='',
                 iv='',
             )
-            if self.accounts_changed is not None:
-                self.accounts_changed()
+            self.mark_dirty()
+        if self.accounts_changed is not None:
+            self.accounts_changed()
 
     def update_timestamp(self, uid, timestamp=None):
         uid = str(uid)
-        self.latest_uid = uid
         if not timestamp:
             timestamp = time.strftime(babelfish.constants.TIME_FMT)
-        if uid not in self.accounts:
-            self.add_account(uid)
-        self.accounts[uid]['last_update'] = timestamp
-        self.flush()
+        with self.lock:
+            self.latest_uid = uid
+            if uid not in self.accounts:
+                self.add_account(uid)
+            self.accounts[uid]['last_update'] = timestamp
+            self.mark_dirty()
 
     @property
     def latest_uid(self):
@@ -100,7 +197,9 @@ class AccountRecord:
     @latest_uid.setter
     def latest_uid(self, value):
         if self.meta['latest'] != value:
-            self.meta['latest'] = value
+            with self.lock:
+                self.meta['latest'] = value
+                self.mark_dirty()
             if self.latest_uid_changed is not None:
                 self.latest_uid_changed(value)
 
@@ -109,51 +208,328 @@ class AccountRecord:
         return easydict.EasyDict(self.accounts[uid])
 
     def set_user_property(self, uid: str, key: str, value):
-        self.accounts[uid][key] = value
-        self.flush()
+        with self.lock:
+            self.accounts[uid][key] = value
+            self.mark_dirty()
+
+    def most_recent_uid(self) -> str:
+        updated = [
+            (properties['last_update'], uid)
+            for uid, properties in self.accounts.items()
+            if properties['last_update']
+        ]
+        return max(updated)[1] if updated else ''
 
     def set_secrets(self, uid: str, secrets: Dict[str, str]):
-        self.secrets[uid] = secrets
-        secret_str = json.dumps(secrets)
-        iv, encrypted = security.AES192.encrypt(
-            secret_str, security.token_aes128_key16b,
-        )
-        self.accounts[uid]['iv'] = security.Base64.encode(iv)
-        self.flush()
+        iv, encrypted = encrypt_secrets(secrets)
         storage_path = os.path.join(cfg.user_info_dir, uid)
-        with open(storage_path, 'wb') as fout:
-            fout.write(encrypted)
+        with self.lock:
+            self.accounts[uid]['iv'] = iv
+            self.mark_dirty()
+            atomic_write(storage_path, encrypted)
+            # the iv must not get out of sync with the encrypted file
+            self.flush()
 
     def unset_secrets(self, uid: str):
-        if uid in self.secrets:
-            del self.secrets[uid]
-        self.set_user_property(uid, 'iv', '')
-        storage_path = os.path.join(cfg.user_info_dir, uid)
-        if os.path.isfile(storage_path):
-            os.unlink(storage_path)
+        with self.lock:
+            self.set_user_property(uid, 'iv', '')
+            storage_path = os.path.join(cfg.user_info_dir, uid)
+            if os.path.isfile(storage_path):
+                os.unlink(storage_path)
+            self.flush()
 
-    def load_secrets(self, uid: str):
+    def read_encrypted_secrets(self, uid: str) -> Optional[Tuple[str, bytes]]:
+        iv = self.accounts.get(uid, dict()).get('iv')
         storage_path = os.path.join(cfg.user_info_dir, uid)
+        if not iv or not os.path.isfile(storage_path):
+            return None
         with open(storage_path, 'rb') as fin:
-            encrypted = fin.read()
-        iv = security.Base64.decode(self.accounts[uid]['iv'])
-        secret_str = security.AES192.decrypt(
-            encrypted, security.token_aes128_key16b, iv,
+            return iv, fin.read()
+
+    def get_secret(self, uid: str, key: str):
+        # decrypted on each call, so that no plaintext is kept in memory
+        encrypted_secrets = self.read_encrypted_secrets(uid)
+        if encrypted_secrets is None:
+            raise KeyError(uid)
+        return decrypt_secrets(*encrypted_secrets)[key]
+
+
+class SQLiteAccountRecord:
+    """
+    The accounts and their properties stored in an SQLite database, along
+    with their encrypted secrets. Accounts are looked up by their indexed
+    uid instead of loading every account, and the database is in WAL mode so
+    that readers are not blocked by a writer. Each thread uses its own
+    connection, and changes are committed as soon as they are made, or at
+    the end of the outermost `transaction()`.
+
+    On creation, the accounts of the JSON layout are imported once, i.e.
+    accounts.json and the secret files in the user info directory, which are
+    left in place.
+    """
+
+    # callbacks
+    latest_uid_changed = None
+    accounts_changed = None
+
+    columns = ('last_update', 'iv')
+
+    def __init__(self, path: str, json_path: Optional[str] = None):
+        self._path = path
+        self.local = threading.local()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self.transaction():
+            for sql in self.schema():
+                self.execute(sql)
+            if json_path is not None:
+                self.migrate(json_path)
+
+    @staticmethod
+    def schema():
+        return [
+            '''CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );''',
+            '''CREATE TABLE IF NOT EXISTS accounts (
+                uid TEXT PRIMARY KEY,
+                last_update TEXT NOT NULL DEFAULT '',
+                iv TEXT NOT NULL DEFAULT '',
+                secrets BLOB
+            );''',
+            '''CREATE INDEX IF NOT EXISTS idx_accounts_last_update
+                ON accounts (last_update);''',
+        ]
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            # statements are committed right away unless BEGIN is executed
+            conn = sqlite3.connect(
+                self._path, timeout=10.0, isolation_level=None,
+            )
+            conn.execute('PRAGMA journal_mode=WAL;')
+            conn.execute('PRAGMA synchronous=NORMAL;')
+            self.local.conn = conn
+        return conn
+
+    def execute(self, sql, parameters=()) -> sqlite3.Cursor:
+        return self.conn.execute(sql, parameters)
+
+    @contextmanager
+    def transaction(self):
+        """
+        Runs the changes made within the context in one transaction, which
+        is committed when the outermost transaction ends, or rolled back if
+        an exception is raised. Transactions are nested per thread, and the
+        write lock of the database is held until the end of the outermost
+        one, so writers of other connections wait meanwhile: keep it short.
+        """
+
+        depth = getattr(self.local, 'transaction_depth', 0)
+        outermost = not depth
+        if outermost:
+            self.execute('BEGIN IMMEDIATE;')
+        self.local.transaction_depth = depth + 1
+        try:
+            yield self
+        except BaseException:
+            if outermost:
+                self.execute('ROLLBACK;')
+            raise
+        else:
+            if outermost:
+                self.execute('COMMIT;')
+        finally:
+            self.local.transaction_depth = depth
+
+    def migrate(self, json_path: str):
+        migrated = self.execute(
+            "SELECT value FROM meta WHERE key = 'migrated';",
+        ).fetchone()
+        if migrated:
+            return
+        self.execute(
+            "INSERT INTO meta (key, value) VALUES ('migrated', ?);",
+            (time.strftime(babelfish.constants.TIME_FMT),),
+        )
+        if not os.path.isfile(json_path):
+            return
+        try:
+            with open(json_path, encoding='utf-8') as fin:
+                cache = json.load(fin)
+        except (OSError, ValueError):
+            logger.error(traceback.format_exc())
+            return
+        rows = []
+        for uid, properties in cache.get('accounts', dict()).items():
+            iv, secrets = properties.get('iv', ''), None
+            storage_path = os.path.join(cfg.user_info_dir, uid)
+            if iv and os.path.isfile(storage_path):
+                with open(storage_path, 'rb') as fin:
+                    secrets = fin.read()
+            rows.append((
+                uid, properties.get('last_update', ''),
+                iv if secrets else '', secrets,
+            ))
+        self.conn.executemany(
+            'INSERT OR IGNORE INTO accounts (uid, last_update, iv, secrets) '
+            'VALUES (?, ?, ?, ?);',
+            rows,
         )
-        self.secrets[uid] = json.loads(secret_str)
+        latest = cache.get('meta', dict()).get('latest', '')
+        if latest:
+            self.execute(
+                "INSERT OR REPLACE INTO meta (key, value) "
+                "VALUES ('latest', ?);",
+                (latest,),
+            )
+        logger.info(f'Migrated {len(rows)} accounts from {json_path}')
+
+    def flush(self):
+        pass  # changes are committed as they are made
+
+    @property
+    def accounts(self) -> Dict[str, Dict[str, str]]:
+        rows = self.execute(
+            'SELECT uid, last_update, iv FROM accounts ORDER BY rowid;',
+        )
+        return {
+            uid: dict(last_update=last_update, iv=iv)
+            for uid, last_update, iv in rows
+        }
+
+    def add_account(self, uid: str):
+        uid = str(uid)
+        cursor = self.execute(
+            'INSERT OR IGNORE INTO accounts (uid) VALUES (?);', (uid,),
+        )
+        if cursor.rowcount and self.accounts_changed is not None:
+            self.accounts_changed()
+
+    def update_timestamp(self, uid, timestamp=None):
+        uid = str(uid)
+        if not timestamp:
+            timestamp = time.strftime(babelfish.constants.TIME_FMT)
+        with self.transaction():
+            self.latest_uid = uid
+            self.add_account(uid)
+            self.execute(
+                'UPDATE accounts SET last_update = ? WHERE uid = ?;',
+                (timestamp, uid),
+            )
+
+    @property
+    def latest_uid(self):
+        row = self.execute(
+            "SELECT value FROM meta WHERE key = 'latest';",
+        ).fetchone()
+        return row[0] if row else ''
+
+    @latest_uid.setter
+    def latest_uid(self, value):
+        if self.latest_uid != value:
+            self.execute(
+                "INSERT OR REPLACE INTO meta (key, value) "
+                "VALUES ('latest', ?);",
+                (value,),
+            )
+            if self.latest_uid_changed is not None:
+                self.latest_uid_changed(value)
+
+    def most_recent_uid(self) -> str:
+        row = self.execute(
+            "SELECT uid FROM accounts WHERE last_update != '' "
+            'ORDER BY last_update DESC LIMIT 1;',
+        ).fetchone()
+        return row[0] if row else ''
+
+    def get_user_properties(self, uid: str):
+        uid = str(uid)
+        row = self.execute(
+            'SELECT last_update, iv FROM accounts WHERE uid = ?;', (uid,),
+        ).fetchone()
+        if row is None:
+            raise KeyError(uid)
+        return easydict.EasyDict(zip(self.columns, row))
+
+    def set_user_property(self, uid: str, key: str, value):
+        if key not in self.columns:
+            raise KeyError(key)
+        self.execute(
+            f'UPDATE accounts SET {key} = ? WHERE uid = ?;', (value, uid),
+        )
+
+    def set_secrets(self, uid: str, secrets: Dict[str, str]):
+        iv, encrypted = encrypt_secrets(secrets)
+        self.execute(
+            'UPDATE accounts SET iv = ?, secrets = ? WHERE uid = ?;',
+            (iv, encrypted, uid),
+        )
+
+    def unset_secrets(self, uid: str):
+        self.execute(
+            "UPDATE accounts SET iv = '', secrets = NULL WHERE uid = ?;",
+            (uid,),
+        )
+
+    def read_encrypted_secrets(self, uid: str) -> Optional[Tuple[str, bytes]]:
+        row = self.execute(
+            'SELECT iv, secrets FROM accounts '
+            'WHERE uid = ? AND secrets IS NOT NULL;',
+            (uid,),
+        ).fetchone()
+        return None if row is None else (row[0], row[1])
 
     def get_secret(self, uid: str, key: str):
-        if uid not in self.secrets:
-            self.load_secrets(uid)
-        return self.secrets[uid][key]
+        # decrypted on each call, so that no plaintext is kept in memory
+        encrypted_secrets = self.read_encrypted_secrets(uid)
+        if encrypted_secrets is None:
+            raise KeyError(uid)
+        return decrypt_secrets(*encrypted_secrets)[key]
+
+
+def create_account_record():
+    if cfg.account_backend == 'sqlite':
+        return SQLiteAccountRecord(
+            cfg.account_db_path, json_path=cfg.account_record_path,
+        )
+    return AccountRecord(cfg.account_record_path)
+
+
+class LazyAccountRecord:
+    """
+    Creates the account record of the configured backend on first use, i.e.
+    after the configuration is loaded, and forwards everything to it.
+    """
+
+    def __init__(self):
+        object.__setattr__(self, 'record', None)
+        object.__setattr__(self, 'lock', threading.Lock())
+
+    def get(self):
+        with self.lock:
+            if self.record is None:
+                object.__setattr__(self, 'record', create_account_record())
+            return self.record
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self.get(), name, value)
 
 
-account_record = AccountRecord(cfg.account_record_path)
+account_record = LazyAccountRecord()
 
 
 def get_latest_uid():
     if account_record.latest_uid:
         return account_record.latest_uid
+    most_recent_uid = account_record.most_recent_uid()
+    if most_recent_uid:
+        return most_recent_uid
     if os.path.isdir(cfg.db_dir):
         caches = os.listdir(cfg.db_dir)
         caches = [
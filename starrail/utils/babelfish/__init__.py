@@ -71,6 +71,8 @@ ui_load_failure = dictionary.ui_load_failure
 ui_load_gacha = dictionary.ui_load_gacha
 ui_load_success = dictionary.ui_load_success
 ui_load_success_msg = dictionary.ui_load_success_msg
+ui_loading_gacha = dictionary.ui_loading_gacha
+ui_loading_gacha_progress = dictionary.ui_loading_gacha_progress
 ui_locale = dictionary.ui_locale
 ui_locale_setting_desc = dictionary.ui_locale_setting_desc
 ui_no_data = dictionary.ui_no_data
@@ -111,6 +113,7 @@ ui_sync_gacha_fail = dictionary.ui_sync_gacha_fail
 ui_sync_gacha_initial = dictionary.ui_sync_gacha_initial
 ui_sync_gacha_success = dictionary.ui_sync_gacha_success
 ui_synchronizing_gacha = dictionary.ui_synchronizing_gacha
+ui_task_running = dictionary.ui_task_running
 ui_theme_mode = dictionary.ui_theme_mode
 ui_theme_mode_dark = dictionary.ui_theme_mode_dark
 ui_theme_mode_light = dictionary.ui_theme_mode_light
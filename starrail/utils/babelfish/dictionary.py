@@ -197,6 +197,11 @@ ui_load_success_msg = _MS(
     en='Successfully loaded {cnt} items for uid {uid}.',
     zhs='成功导入了用户{uid}的{cnt}条记录。',
 )
+ui_loading_gacha = _MS(en='Loading...', zhs='正在导入抽卡数据')
+ui_loading_gacha_progress = _MS(
+    en='Loaded {cnt} items ({percent}%)',
+    zhs='已导入{cnt}条记录（{percent}%）',
+)
 ui_locale = _MS(en='Display Language', zhs='显示语言')
 ui_locale_setting_desc = _MS(en='Changing the display language', zhs='改变显示语言')
 ui_no_data = _MS(en='No Data', zhs='暂无数据')
@@ -270,6 +275,10 @@ ui_synchronizing_gacha = _MS(
     en='Synchronizing...',
     zhs='正在同步抽卡数据',
 )
+ui_task_running = _MS(
+    en='This task is already running',
+    zhs='该任务正在进行中',
+)
 ui_theme_mode = _MS(en='Theme Mode', zhs='应用主题')
 ui_theme_mode_dark = _MS(en='Dark', zhs='深色')
 ui_theme_mode_light = _MS(en='Light', zhs='浅色')
@@ -0,0 +1,259 @@
+import json
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+from starrail.utils import loggings
+from starrail.utils.misc import atomic_write
+
+logger = loggings.get_logger(__file__)
+
+
+class LRUCache:
+    """
+    A thread-safe in-memory cache holding at most `max_size` items, the least
+    recently used item is evicted when it is full. If given, `on_remove` is
+    called with the key and the value of every item leaving the cache, i.e.
+    evicted, expired, replaced, deleted or cleared.
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        on_remove: Optional[Callable[[Hashable, Any], None]] = None,
+    ):
+        self.max_size = max_size
+        self.on_remove = on_remove
+        self.data: OrderedDict = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        with self.lock:
+            return len(self.data)
+
+    def __contains__(self, key: Hashable):
+        with self.lock:
+            return key in self.data
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        with self.lock:
+            if key not in self.data:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self.data.move_to_end(key)
+            return self.data[key]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self.lock:
+            self.replace(key, value)
+            self.shrink()
+
+    def value_of(self, item: Any) -> Any:
+        # the value of an item as stored in `data`
+        return item
+
+    def removed(self, key: Hashable, item: Any) -> None:
+        # the lock must be held by the caller
+        if self.on_remove is not None:
+            self.on_remove(key, self.value_of(item))
+
+    def replace(self, key: Hashable, item: Any) -> None:
+        # the lock must be held by the caller
+        previous = self.data.get(key)
+        self.data[key] = item
+        self.data.move_to_end(key)
+        if (
+            previous is not None
+            and self.value_of(previous) is not self.value_of(item)
+        ):
+            self.removed(key, previous)
+
+    def shrink(self) -> None:
+        # the lock must be held by the caller
+        while len(self.data) > self.max_size:
+            self.removed(*self.data.popitem(last=False))
+            self.evictions += 1
+
+    def delete(self, key: Hashable) -> None:
+        with self.lock:
+            item = self.data.pop(key, None)
+            if item is not None:
+                self.removed(key, item)
+
+    def clear(self) -> None:
+        with self.lock:
+            for key, item in self.data.items():
+                self.removed(key, item)
+            self.data.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            return dict(
+                size=len(self.data),
+                hits=self.hits,
+                misses=self.misses,
+                evictions=self.evictions,
+            )
+
+
+class ExpirableCache(LRUCache):
+    """
+    A thread-safe LRU cache whose items expire `expires` seconds after they
+    are set. Expired items are dropped when they are looked up, and all of
+    them are purged at most every `purge_interval` seconds when items are
+    set, so that keys never looked up again do not pile up. Expiry times are
+    wall clock times, so that they stay valid across processes.
+    """
+
+    def __init__(
+        self,
+        expires: float,
+        max_size: int = 1024,
+        purge_interval: Optional[float] = None,
+        on_remove: Optional[Callable[[Hashable, Any], None]] = None,
+    ):
+        super().__init__(max_size=max_size, on_remove=on_remove)
+        self.expires = expires
+        self.purge_interval = (
+            expires if purge_interval is None else purge_interval
+        )
+        self.last_purge = time.time()
+        self.expirations = 0
+
+    def __contains__(self, key: Hashable):
+        with self.lock:
+            item = self.data.get(key)
+            return item is not None and time.time() < item[0]
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        with self.lock:
+            item = self.data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            expire_time, value = item
+            if time.time() >= expire_time:
+                del self.data[key]
+                self.removed(key, item)
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self.hits += 1
+            self.data.move_to_end(key)
+            return value
+
+    def set(
+        self,
+        key: Hashable,
+        value: Any,
+        expires: Optional[float] = None,
+    ) -> None:
+        curr_time = time.time()
+        expires = self.expires if expires is None else expires
+        with self.lock:
+            self.replace(key, (curr_time + expires, value))
+            if curr_time - self.last_purge >= self.purge_interval:
+                self.purge_expired(curr_time)
+            self.shrink()
+
+    def purge(self) -> int:
+        """
+        Removes all the expired items, returns the number of removed items.
+        """
+
+        with self.lock:
+            return self.purge_expired(time.time())
+
+    def purge_expired(self, curr_time: float) -> int:
+        # the lock must be held by the caller
+        expired = [
+            key for key, (expire_time, _) in self.data.items()
+            if curr_time >= expire_time
+        ]
+        for key in expired:
+            self.removed(key, self.data.pop(key))
+        self.expirations += len(expired)
+        self.last_purge = curr_time
+        return len(expired)
+
+    def value_of(self, item: Any) -> Any:
+        return item[1]
+
+    def stats(self) -> Dict[str, int]:
+        stats = super().stats()
+        with self.lock:
+            stats['expirations'] = self.expirations
+        return stats
+
+
+class PersistentExpirableCache(ExpirableCache):
+    """
+    An ExpirableCache whose items are saved to a JSON file along with their
+    expiry times whenever one is set, and loaded back when it is created.
+    Keys must be strings and values JSON serializable.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        expires: float,
+        max_size: int = 1024,
+        purge_interval: Optional[float] = None,
+    ):
+        super().__init__(
+            expires=expires, max_size=max_size, purge_interval=purge_interval,
+        )
+        self.path = path
+        self.load()
+
+    def read_file(self) -> Dict[str, List]:
+        try:
+            with open(self.path, encoding='utf-8') as fin:
+                items = json.load(fin)
+        except FileNotFoundError:
+            return dict()
+        except (OSError, ValueError):
+            logger.warning(f'Cache file {self.path} is broken, ignoring it')
+            return dict()
+        curr_time = time.time()
+        return {
+            key: item for key, item in items.items()
+            if isinstance(item, list) and len(item) == 2
+            and curr_time < item[0]
+        }
+
+    def load(self) -> None:
+        items = self.read_file()
+        with self.lock:
+            # the ones expiring last are the most recently set
+            for key, item in sorted(items.items(), key=lambda it: it[1][0]):
+                self.data[key] = tuple(item)
+            self.shrink()
+
+    def set(
+        self,
+        key: Hashable,
+        value: Any,
+        expires: Optional[float] = None,
+    ) -> None:
+        super().set(key, value, expires=expires)
+        self.save()
+
+    def save(self) -> None:
+        with self.lock:
+            # merges the items set by other processes meanwhile
+            items = self.read_file()
+            curr_time = time.time()
+            for key, (expire_time, value) in self.data.items():
+                if curr_time < expire_time:
+                    items[key] = [expire_time, value]
+            try:
+                atomic_write(self.path, json.dumps(items, ensure_ascii=False))
+            except OSError:
+                logger.error(traceback.format_exc())
@@ -1,47 +1,254 @@
+import atexit
+import json
 import os
+import threading
+import time
 import traceback
-from typing import Tuple
+from typing import Dict, Optional, Tuple
 from urllib.parse import urlparse
 
 import requests
 
 from starrail.config import configuration as cfg
 from starrail.utils import loggings
-from starrail.utils.misc import sha1
+from starrail.utils.misc import atomic_write, sha1
+from starrail.utils.session import get_session
 
 logger = loggings.get_logger(__file__)
 
+_resource_cache: Optional['ResourceCache'] = None
+_resource_cache_lock = threading.Lock()
+
 
 def get_filename_from_url(url: str) -> str:
     path = urlparse(url).path
     return os.path.basename(path)
 
 
-def download(url: str, cached: bool = True) -> Tuple[bytes, str]:
+def get_cache_filename(url: str) -> str:
     hash = sha1(url)
     max_length = 127 - 1 - len(hash)
     filename = get_filename_from_url(url)
     if len(filename) > max_length:
         start = len(filename) - max_length
         filename = filename[start:]
-    cache_path = os.path.join(cfg.res_cache_dir, f'{hash}_{filename}')
+    return f'{hash}_{filename}'
 
-    if cached and os.path.isfile(cache_path):
-        with open(cache_path, 'rb') as fin:
-            data = fin.read()
-        return data, cache_path
 
+class ResourceCache:
+    """
+    An on-disk HTTP cache of downloaded resources. The ETag and Last-Modified
+    headers of each entry are kept in an index file so that entries can be
+    revalidated with conditional requests, and least recently used entries
+    are evicted when the total size exceeds `max_size` bytes. The index is
+    written behind, `flush_delay` seconds after the first unsaved change, so
+    that a burst of downloads saves it once.
+    """
+
+    index_name = 'index.json'
+
+    def __init__(
+        self,
+        cache_dir: str,
+        max_size: int,
+        flush_delay: float = 1.0,
+    ):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.flush_delay = flush_delay
+        self.index_path = os.path.join(cache_dir, self.index_name)
+        self.lock = threading.RLock()
+        self.dirty = False
+        self.timer: Optional[threading.Timer] = None
+        self.entries: Dict[str, Dict] = self.load_index()
+        atexit.register(self.flush)
+
+    def load_index(self) -> Dict[str, Dict]:
+        entries = dict()
+        if os.path.isfile(self.index_path):
+            try:
+                with open(self.index_path, encoding='utf-8') as fin:
+                    entries = json.load(fin)
+            except (OSError, ValueError):
+                logger.warning('Resource cache index is broken, rebuilding')
+        os.makedirs(self.cache_dir, exist_ok=True)
+        files = {
+            name for name in os.listdir(self.cache_dir)
+            if name != self.index_name and not name.startswith('.')
+        }
+        # drops entries whose files are gone, and adopts files cached before
+        # the index existed, without validators
+        entries = {k: v for k, v in entries.items() if k in files}
+        for name in files - set(entries):
+            path = os.path.join(self.cache_dir, name)
+            entries[name] = dict(
+                size=os.path.getsize(path),
+                last_access=os.path.getmtime(path),
+            )
+        return entries
+
+    def path(self, url: str) -> str:
+        return os.path.join(self.cache_dir, get_cache_filename(url))
+
+    def read(self, url: str) -> Optional[bytes]:
+        """
+        Returns the cached content of an URL, or None if it is not cached.
+        """
+
+        name = get_cache_filename(url)
+        with self.lock:
+            if name not in self.entries:
+                return None
+            try:
+                with open(self.path(url), 'rb') as fin:
+                    data = fin.read()
+            except OSError:
+                del self.entries[name]
+                self.dirty = True
+                return None
+            self.entries[name]['last_access'] = time.time()
+            self.dirty = True
+            return data
+
+    def validators(self, url: str) -> Dict[str, str]:
+        """
+        Returns the headers of a conditional request revalidating the cached
+        entry of an URL.
+        """
+
+        with self.lock:
+            entry = self.entries.get(get_cache_filename(url), dict())
+            headers = dict()
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+            return headers
+
+    def store(self, url: str, data: bytes, headers) -> None:
+        name = get_cache_filename(url)
+        with self.lock:
+            atomic_write(self.path(url), data)
+            self.entries[name] = dict(
+                url=url,
+                size=len(data),
+                last_access=time.time(),
+                etag=headers.get('ETag'),
+                last_modified=headers.get('Last-Modified'),
+            )
+            self.evict(keep=name)
+            self.mark_dirty()
+
+    def evict(self, keep: Optional[str] = None) -> None:
+        with self.lock:
+            total = sum(entry['size'] for entry in self.entries.values())
+            if total <= self.max_size:
+                return
+            lru = sorted(
+                self.entries.items(), key=lambda it: it[1]['last_access'],
+            )
+            for name, entry in lru:
+                if total <= self.max_size:
+                    break
+                if name == keep:
+                    continue
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except FileNotFoundError:
+                    pass
+                total -= entry['size']
+                del self.entries[name]
+                logger.debug(f'Evicted {name} from resource cache')
+            self.dirty = True
+
+    def mark_dirty(self) -> None:
+        # schedules a flush unless one is already scheduled
+        with self.lock:
+            self.dirty = True
+            if self.timer is not None:
+                return
+            self.timer = threading.Timer(self.flush_delay, self.delayed_flush)
+            self.timer.daemon = True  # flushed by atexit otherwise
+            self.timer.start()
+
+    def delayed_flush(self) -> None:
+        with self.lock:
+            self.timer = None
+            self.flush()
+
+    def save_index(self) -> None:
+        with self.lock:
+            atomic_write(
+                self.index_path, json.dumps(self.entries, ensure_ascii=False),
+            )
+            self.dirty = False
+
+    def flush(self) -> None:
+        # access times are only persisted along with other changes, or here
+        with self.lock:
+            if self.dirty:
+                try:
+                    self.save_index()
+                except OSError:
+                    logger.error(traceback.format_exc())
+
+
+def get_resource_cache() -> ResourceCache:
+    global _resource_cache
+    with _resource_cache_lock:
+        if _resource_cache is None:
+            _resource_cache = ResourceCache(
+                cfg.res_cache_dir, cfg.res_cache_max_size,
+            )
+        return _resource_cache
+
+
+def download(
+    url: str,
+    cached: bool = True,
+    session: Optional[requests.Session] = None,
+) -> Tuple[bytes, str]:
+    """
+    Downloads a resource through the resource cache.
+
+    Args:
+        url (str): The URL of the resource.
+        cached (bool): If True, a cached resource is returned without any
+            request. Otherwise the cached resource is revalidated with a
+            conditional request, and only downloaded again if it changed.
+        session (requests.Session, optional): The session sending requests.
+
+    Returns:
+        Tuple[bytes, str]: The content and the cache path of the resource,
+            or empty ones if it is neither downloaded nor cached.
+    """
+
+    cache = get_resource_cache()
+    cache_path = cache.path(url)
+
+    if cached:
+        data = cache.read(url)
+        if data is not None:
+            return data, cache_path
+
+    session = session or get_session()
     try:
-        r = requests.get(url, timeout=5)
+        r = session.get(url, timeout=5, headers=cache.validators(url))
+        if r.status_code == 304:
+            data = cache.read(url)
+            if data is not None:
+                logger.debug(f'Resource not modified: {url}')
+                return data, cache_path
+            # the cached file is gone, e.g. evicted meanwhile or deleted
+            logger.debug(f'Cached copy of {url} is missing, refetching')
+            r = session.get(url, timeout=5)
         if 200 <= r.status_code < 300:
-            with open(cache_path, 'wb') as fout:
-                fout.write(r.content)
+            cache.store(url, r.content, r.headers)
             return r.content, cache_path
     except Exception:
         logger.error(traceback.format_exc())
 
-    if os.path.isfile(cache_path):  # fallback to cache
-        with open(cache_path, 'rb') as fin:
-            data = fin.read()
+    data = cache.read(url)  # fallback to cache
+    if data is not None:
         return data, cache_path
     return b'', ''
@@ -2,8 +2,14 @@ import functools
 import hashlib
 import importlib
 import io
+import os
+import stat
+import tempfile
+from typing import Union
 
-import qrcode
+# read once, as it can only be read by setting it
+_umask = os.umask(0)
+os.umask(_umask)
 
 
 @functools.lru_cache
@@ -20,15 +26,51 @@ def sha1(data):
     return hasher.hexdigest()
 
 
+def atomic_write(path: str, data: Union[bytes, str]) -> None:
+    """
+    Writes a file atomically: data is written to a temporary file in the same
+    directory, which then replaces the target file. Readers never see a
+    partially written file, even if the process is killed while writing, and
+    the data is flushed to disk before the replacement. The permissions of
+    the target file are kept, new files get the default ones.
+    """
+
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    directory = os.path.dirname(os.path.abspath(path))
+    try:
+        mode = stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        mode = 0o666 & ~_umask
+    fd, tmp_path = tempfile.mkstemp(
+        dir=directory, prefix='.', suffix='.tmp',
+    )
+    try:
+        with os.fdopen(fd, 'wb') as fout:
+            fout.write(data)
+            fout.flush()
+            os.fsync(fout.fileno())
+        os.chmod(tmp_path, mode)  # mkstemp creates it with mode 0600
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
 def create_qrcode_image(
     data,
     version=1,
-    error_correction=qrcode.ERROR_CORRECT_L,
+    error_correction=None,
     box_size=10,
     border=1,
     fill_color='black',
     back_color='white',
 ) -> bytes:
+    import qrcode
+
+    if error_correction is None:
+        error_correction = qrcode.ERROR_CORRECT_L
     code = qrcode.QRCode(
         version=version,
         error_correction=error_correction,
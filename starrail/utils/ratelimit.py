@@ -0,0 +1,75 @@
+import threading
+import time
+from typing import Dict
+from urllib.parse import urlparse
+
+
+class TokenBucket:
+    """
+    A thread-safe token bucket rate limiter. A token is refilled every
+    `interval` seconds and at most `capacity` tokens can be stored, so with
+    the default capacity of 1, requests of all threads sharing the bucket are
+    separated by at least `interval` seconds.
+    """
+
+    def __init__(self, interval: float, capacity: int = 1):
+        self.interval = interval
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.timestamp = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """
+        Takes a token from the bucket, blocks until it is available.
+
+        Returns:
+            float: The time (seconds) spent waiting for the token.
+        """
+
+        if self.interval <= 0:
+            return 0.0
+        with self.lock:
+            now = time.monotonic()
+            elapsed = now - self.timestamp
+            self.tokens = min(
+                self.capacity,
+                self.tokens + elapsed / self.interval,
+            )
+            self.timestamp = now
+            # a negative balance reserves a future slot for this caller, so
+            # the lock does not need to be held while sleeping
+            self.tokens -= 1
+            wait_time = -self.tokens * self.interval if self.tokens < 0 else 0
+        if wait_time > 0:
+            time.sleep(wait_time)
+        return wait_time
+
+
+class HostRateLimiter:
+    """
+    A thread-safe registry of token buckets, one for each host, so that
+    requests to the same host are rate limited together no matter which
+    account or thread sends them.
+    """
+
+    def __init__(self, interval: float, capacity: int = 1):
+        self.interval = interval
+        self.capacity = capacity
+        self.buckets: Dict[str, TokenBucket] = dict()
+        self.lock = threading.Lock()
+
+    def get(self, url: str) -> TokenBucket:
+        """
+        Returns the token bucket of the host of an URL, which is created on
+        the first call.
+        """
+
+        host = urlparse(url).netloc.lower()
+        with self.lock:
+            if host not in self.buckets:
+                self.buckets[host] = TokenBucket(self.interval, self.capacity)
+            return self.buckets[host]
+
+    def acquire(self, url: str) -> float:
+        return self.get(url).acquire()
@@ -1,61 +1,296 @@
 import functools
+import heapq
+import itertools
+import random
 import threading
 import time
 import traceback
-from typing import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
 
+from starrail.config import configuration as cfg
 from starrail.utils import loggings
 
 logger = loggings.get_logger(__file__)
 
+_scheduler: Optional['Scheduler'] = None
+_scheduler_lock = threading.Lock()
 
-class IntervalThread(threading.Thread):
 
-    def __init__(self, interval: float, func: Callable):
-        super().__init__(daemon=True)
-        self.interval = interval
-        self.func = func
-        self.stop_event = threading.Event()
-
-    def run(self):
-        while not self.stop_event.is_set():
-            start_time = time.time()
-            try:
-                self.func()
-            except Exception:
-                logger.error(traceback.format_exc())
-            end_time = time.time()
-            wait_time = start_time - end_time + self.interval
-            if wait_time > 0:
-                self.stop_event.wait(wait_time)
+class JobMetrics:
+    """
+    The runtime metrics of the runs of a named job.
+    """
 
-    def stop(self):
-        self.stop_event.set()
+    def __init__(self):
+        self.runs = 0
+        self.failures = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.last_time = 0.0
+        self.last_start = 0.0
 
+    def record(self, start: float, elapsed: float, failed: bool) -> None:
+        self.runs += 1
+        self.failures += int(failed)
+        self.total_time += elapsed
+        self.max_time = max(self.max_time, elapsed)
+        self.last_time = elapsed
+        self.last_start = start
 
-def set_interval(
-    interval: float,
-    func: Callable,
-    *args,
-    **kwargs,
-) -> IntervalThread:
+    def todict(self) -> Dict[str, float]:
+        return dict(
+            runs=self.runs,
+            failures=self.failures,
+            total_time=self.total_time,
+            mean_time=self.total_time / self.runs if self.runs else 0.0,
+            max_time=self.max_time,
+            last_time=self.last_time,
+            last_start=self.last_start,
+        )
+
+
+class Job:
     """
-    Starts and returns an interval-based thread that executes the provided
-    callable at each interval.
+    A named job of a Scheduler, run once, or every `interval` seconds if
+    given. Each run is delayed by a random extra time of up to `jitter`
+    seconds, so that jobs scheduled together do not fire together.
 
-    Args:
-        interval (float): The time interval between each execution of the
-            callable in seconds.
-        func (callable): The function to be executed at each interval.
-        *args: Variable-length argument list to be passed to the callable.
-        **kwargs: Arbitrary keyword arguments to be passed to the callable.
+    The future of a job resolves to the result of its run, or to None once a
+    periodic job is cancelled.
+    """
 
-    Returns:
-        IntervalThread: An instance of the interval-based thread.
+    def __init__(
+        self,
+        scheduler: 'Scheduler',
+        name: str,
+        func: Callable,
+        interval: Optional[float] = None,
+        jitter: float = 0.0,
+    ):
+        self.scheduler = scheduler
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.jitter = jitter
+        self.future: Future = Future()
+        self.cancelled = threading.Event()
+        self.running = False
+
+    def cancel(self) -> bool:
+        """
+        Cancels the job. A run in progress is not interrupted, but a periodic
+        job is not run again.
+        """
+
+        return self.scheduler.cancel_job(self)
+
+
+class Scheduler:
+    """
+    Runs named jobs, once or periodically, on one bounded pool of worker
+    threads. A job is not scheduled while another job of the same name is
+    pending or running, and the runtime of the runs of each name is
+    recorded. The threads of the scheduler are named after `name`.
     """
 
-    _callable = functools.partial(func, *args, **kwargs)
-    thread = IntervalThread(interval=interval, func=_callable)
-    thread.start()
+    def __init__(self, max_workers: int = 4, name: str = 'scheduler'):
+        self.name = name
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix=name,
+        )
+        self.jobs: Dict[str, Job] = dict()
+        self.job_metrics: Dict[str, JobMetrics] = dict()
+        self.queue: List[Tuple[float, int, Job]] = []
+        self.counter = itertools.count()
+        self.condition = threading.Condition()
+        self.dispatcher: Optional[threading.Thread] = None
+        self.closed = False
+
+    def submit(
+        self,
+        name: str,
+        func: Callable,
+        *args,
+        delay: float = 0.0,
+        jitter: float = 0.0,
+        **kwargs,
+    ) -> Optional[Job]:
+        """
+        Runs a callable once, after `delay` seconds.
+
+        Returns:
+            Optional[Job]: The scheduled job, or None if a job of the same
+                name is pending or running.
+        """
+
+        func = functools.partial(func, *args, **kwargs)
+        return self.add(Job(self, name, func, jitter=jitter), delay)
+
+    def schedule(
+        self,
+        name: str,
+        interval: float,
+        func: Callable,
+        *args,
+        delay: float = 0.0,
+        jitter: float = 0.0,
+        **kwargs,
+    ) -> Optional[Job]:
+        """
+        Runs a callable every `interval` seconds, the first time after
+        `delay` seconds. Runs of the same job never overlap, and an exception
+        raised by a run is logged without stopping the job.
+
+        Returns:
+            Optional[Job]: The scheduled job, or None if a job of the same
+                name is pending or running.
+        """
+
+        func = functools.partial(func, *args, **kwargs)
+        job = Job(self, name, func, interval=interval, jitter=jitter)
+        return self.add(job, delay)
+
+    def add(self, job: Job, delay: float) -> Optional[Job]:
+        with self.condition:
+            if self.closed:
+                raise RuntimeError('Cannot schedule jobs after shutdown')
+            if job.name in self.jobs:
+                logger.debug(f'Job {job.name} is already scheduled')
+                return None
+            self.jobs[job.name] = job
+            self.push(job, delay)
+        return job
+
+    def push(self, job: Job, delay: float) -> None:
+        # the condition must be held by the caller
+        if job.jitter:
+            delay += random.uniform(0, job.jitter)
+        due_time = time.monotonic() + delay
+        heapq.heappush(self.queue, (due_time, next(self.counter), job))
+        if self.dispatcher is None:
+            self.dispatcher = threading.Thread(
+                target=self.dispatch, name=f'{self.name}-dispatcher',
+                daemon=True,
+            )
+            self.dispatcher.start()
+        self.condition.notify()
+
+    def dispatch(self) -> None:
+        while True:
+            with self.condition:
+                while not self.closed:
+                    timeout = None
+                    if self.queue:
+                        timeout = self.queue[0][0] - time.monotonic()
+                        if timeout <= 0:
+                            break
+                    self.condition.wait(timeout)
+                if self.closed:
+                    return
+                _, _, job = heapq.heappop(self.queue)
+            if not job.cancelled.is_set():
+                self.executor.submit(self.run, job)
+
+    def run(self, job: Job) -> None:
+        with self.condition:
+            if job.cancelled.is_set():
+                return
+            if job.interval is None or not job.future.running():
+                if not job.future.set_running_or_notify_cancel():
+                    return
+            job.running = True
+        start_time, start = time.time(), time.perf_counter()
+        result, error = None, None
+        try:
+            result = job.func()
+        except BaseException as e:
+            error = e
+            if job.interval is not None:
+                logger.error(f'Job {job.name} failed. Traceback:')
+                logger.error(traceback.format_exc())
+        elapsed = time.perf_counter() - start
+        with self.condition:
+            job.running = False
+            metrics = self.job_metrics.setdefault(job.name, JobMetrics())
+            metrics.record(start_time, elapsed, error is not None)
+            if job.interval is not None and not (
+                job.cancelled.is_set() or self.closed
+            ):
+                # the interval is counted from the start of the run
+                self.push(job, max(job.interval - elapsed, 0.0))
+                return
+            if self.jobs.get(job.name) is job:
+                del self.jobs[job.name]
+        # resolved last, so that a done callback can schedule the name again
+        if job.interval is not None:
+            job.future.set_result(None)
+        elif error is not None:
+            job.future.set_exception(error)
+        else:
+            job.future.set_result(result)
+
+    def cancel(self, name: str) -> bool:
+        """
+        Cancels the job of the given name, returns False if there is none.
+        """
+
+        with self.condition:
+            job = self.jobs.get(name)
+        return job is not None and self.cancel_job(job)
+
+    def cancel_job(self, job: Job) -> bool:
+        with self.condition:
+            if self.jobs.get(job.name) is not job:
+                return False
+            job.cancelled.set()
+            if job.running:
+                return True  # the future is resolved after the run
+            del self.jobs[job.name]
+        if job.interval is None:
+            job.future.cancel()
+        else:
+            job.future.set_result(None)
+        return True
+
+    def is_scheduled(self, name: str) -> bool:
+        with self.condition:
+            return name in self.jobs
+
+    def metrics(self) -> Dict[str, Dict[str, float]]:
+        """
+        Returns the runtime metrics of the jobs run so far, by name.
+        """
+
+        with self.condition:
+            return {
+                name: metrics.todict()
+                for name, metrics in self.job_metrics.items()
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Cancels the pending jobs and stops the scheduler. Runs in progress
+        are not interrupted, and are waited for only if `wait` is True.
+        """
+
+        with self.condition:
+            self.closed = True
+            pending = list(self.jobs.values())
+            self.condition.notify()
+        for job in pending:
+            job.cancel()
+        self.executor.shutdown(wait=wait)
+
+
+def get_scheduler() -> Scheduler:
+    """
+    Returns the scheduler shared by the whole application, which is created
+    on the first call.
+    """
 
-    return thread
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = Scheduler(max_workers=cfg.scheduler_workers)
+        return _scheduler
@@ -2,9 +2,6 @@ import base64
 import hashlib
 from typing import Tuple, Union
 
-from Cryptodome.Cipher import AES
-from Cryptodome.Util.Padding import pad, unpad
-
 
 class AES192:
     """
@@ -25,6 +22,9 @@ class AES192:
                 (IV) and the encrypted cipher text as bytes.
         """
 
+        from Cryptodome.Cipher import AES
+        from Cryptodome.Util.Padding import pad
+
         cipher = AES.new(key=key, mode=AES.MODE_CBC)
         iv = cipher.iv
         ciphertext = cipher.encrypt(pad(plaintext.encode(), AES.block_size))
@@ -45,6 +45,9 @@ class AES192:
             str: The decrypted plaintext as a string.
         """
 
+        from Cryptodome.Cipher import AES
+        from Cryptodome.Util.Padding import unpad
+
         cipher = AES.new(key=key, mode=AES.MODE_CBC, iv=iv)
         plaintext = unpad(cipher.decrypt(ciphertext), AES.block_size)
         return plaintext.decode()
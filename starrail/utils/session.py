@@ -0,0 +1,97 @@
+import threading
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from starrail.config import configuration as cfg
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """
+    An HTTP adapter that applies a default timeout to requests sent without
+    an explicit one.
+    """
+
+    def __init__(self, *args, timeout=None, **kwargs):
+        self.timeout = timeout
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, timeout=None, **kwargs):
+        if timeout is None:
+            timeout = self.timeout
+        return super().send(request, timeout=timeout, **kwargs)
+
+
+def create_session(
+    pool_size: Optional[int] = None,
+    max_retries: Optional[int] = None,
+    backoff_factor: Optional[float] = None,
+    timeout: Optional[float] = None,
+) -> requests.Session:
+    """
+    Creates a session which keeps connections alive and retries failed
+    requests. Arguments left as None are read from the configuration.
+
+    Args:
+        pool_size (int, optional): The maximum number of connections kept
+            alive for each host.
+        max_retries (int, optional): The maximum number of retries of a
+            request.
+        backoff_factor (float, optional): The factor of the exponential
+            backoff between retries.
+        timeout (float, optional): The default timeout (seconds) of requests.
+
+    Returns:
+        requests.Session: The created session.
+    """
+
+    pool_size = cfg.http_pool_size if pool_size is None else pool_size
+    max_retries = cfg.http_max_retries if max_retries is None else max_retries
+    if backoff_factor is None:
+        backoff_factor = cfg.http_backoff_factor
+    timeout = cfg.http_timeout if timeout is None else timeout
+
+    retry = Retry(
+        total=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=(429, 500, 502, 503, 504),
+        raise_on_status=False,
+    )
+    adapter = TimeoutHTTPAdapter(
+        timeout=timeout,
+        pool_maxsize=pool_size,
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def get_session() -> requests.Session:
+    """
+    Returns the session shared by the whole application, which is created
+    on the first call.
+    """
+
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = create_session()
+        return _session
+
+
+def set_session(session: Optional[requests.Session]) -> None:
+    """
+    Replaces the shared session, e.g. with one talking to a stub server. The
+    default session is created again on next use if None is given.
+    """
+
+    global _session
+    with _session_lock:
+        _session = session
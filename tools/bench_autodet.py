@@ -0,0 +1,105 @@
+import argparse
+import os
+import random
+import re
+import tempfile
+import time
+import tracemalloc
+
+from starrail.gacha.autodet import rank_api_urls, scan_cache_file, scan_chunks
+
+legacy_pattern = re.compile(r'https://.+/api/getGachaLog.+game_biz=hkrpg.+')
+
+
+def legacy_scan(cache_path):
+    # reads and decodes the whole file, as done before
+    with open(cache_path, 'rb') as f_cache:
+        cache = f_cache.read()
+    parts = cache.split(b'1/0/')
+    parts = [part.split(b'\x00')[0].decode(errors='ignore') for part in parts]
+    urls = []
+    for part in parts:
+        found = re.findall(legacy_pattern, part)
+        if found:
+            urls.append(found[-1])
+    return urls
+
+
+def make_cache(path: str, size: int, gacha_urls: int = 20):
+    """
+    Writes a file resembling a Chromium cache: cache entries keyed by
+    `1/0/<url>` separated by binary payloads, a few of them being gacha
+    api URLs with different timestamps.
+    """
+
+    rng = random.Random(0)
+    payload = bytes(rng.getrandbits(8) for _ in range(1 << 16))
+    positions = set(rng.sample(range(size // (1 << 14)), gacha_urls))
+    written, index = 0, 0
+    with open(path, 'wb') as fout:
+        while written < size:
+            if index in positions:
+                timestamp = 1690000000 + rng.randrange(10 ** 6)
+                url = (
+                    'https://api-takumi.mihoyo.com/common/gacha_record/api/'
+                    f'getGachaLog?authkey_ver=1&authkey={index:08x}'
+                    f'&lang=zh-cn&game_biz=hkrpg_cn&timestamp={timestamp}'
+                )
+            else:
+                url = f'https://webstatic.mihoyo.com/static/{index}.js'
+            start = rng.randrange(len(payload) - (1 << 14))
+            entry = (
+                b'\x00\x00\x001/0/' + url.encode() + b'\x00'
+                + payload[start:start + rng.randrange(1 << 13, 1 << 14)]
+            )
+            fout.write(entry)
+            written += len(entry)
+            index += 1
+
+
+def measure(scan, path):
+    tracemalloc.start()
+    start = time.perf_counter()
+    urls = list(scan(path))
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return urls, elapsed, peak
+
+
+def chunked_scan(path):
+    with open(path, 'rb') as fin:
+        yield from scan_chunks(fin)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Benchmark scanning a synthetic webCaches data_2 file.',
+    )
+    parser.add_argument(
+        '--size', type=int, default=256,
+        help='Size (MiB) of the synthetic cache file.',
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'data_2')
+        make_cache(path, args.size << 20)
+        print(f'cache size: {os.path.getsize(path) / 2 ** 20:.1f} MiB')
+        results = dict()
+        for name, scan in [
+            ('legacy', legacy_scan),
+            ('mmap', scan_cache_file),
+            ('chunked', chunked_scan),
+        ]:
+            urls, elapsed, peak = measure(scan, path)
+            results[name] = urls
+            print(
+                f'{name:>8}: {elapsed * 1000:8.1f} ms, '
+                f'peak traced memory {peak / 2 ** 20:8.2f} MiB, '
+                f'{len(urls)} urls',
+            )
+        latest = {
+            name: rank_api_urls(urls)[0] for name, urls in results.items()
+        }
+        assert len(set(latest.values())) == 1, latest
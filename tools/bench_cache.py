@@ -0,0 +1,127 @@
+import argparse
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, List, Tuple, Union
+
+from starrail.utils.cache import ExpirableCache
+
+
+class LegacyCache:
+    # the unbounded, unlocked cache used before, for reference
+    def __init__(self, expires: float):
+        self.expires = expires
+        self.cache_data: Dict[Hashable, Dict[str, Any]] = dict()
+
+    def set(self, key: Hashable, value: Any):
+        self.cache_data[key] = dict(
+            expire_time=time.time() + self.expires,
+            data=value,
+        )
+
+    def get(self, key: Hashable) -> Any:
+        if key in self.cache_data:
+            if time.time() < self.cache_data[key]['expire_time']:
+                return self.cache_data[key]['data']
+        return None
+
+
+def run(cache, operation: str, threads: int, ops: int, keys: int) -> float:
+    """
+    Runs `ops` operations on each of `threads` threads at once.
+
+    Returns:
+        float: The elapsed seconds from the start of the first thread to the
+            end of the last one.
+    """
+
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(seed: int):
+        rng = random.Random(seed)
+        sequence = [rng.randrange(keys) for _ in range(ops)]
+        barrier.wait()
+        if operation == 'get':
+            for key in sequence:
+                cache.get(key)
+        elif operation == 'set':
+            for key in sequence:
+                cache.set(key, key)
+        else:  # mixed, 1 set every 10 operations
+            for idx, key in enumerate(sequence):
+                if idx % 10 == 0:
+                    cache.set(key, key)
+                else:
+                    cache.get(key)
+
+    workers = [
+        threading.Thread(target=worker, args=(seed,))
+        for seed in range(threads)
+    ]
+    for thread in workers:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Benchmark the expirable cache under thread contention.',
+    )
+    parser.add_argument(
+        '--ops', type=int, default=100000,
+        help='Number of operations of each thread.',
+    )
+    parser.add_argument(
+        '--keys', type=int, default=4096,
+        help='Number of distinct keys.',
+    )
+    parser.add_argument(
+        '--max-size', type=int, default=1024,
+        help='Maximum size of the cache.',
+    )
+    parser.add_argument(
+        '--threads', nargs='+', type=int, default=[1, 2, 4, 8],
+        help='Numbers of concurrent threads.',
+    )
+    args = parser.parse_args()
+
+    caches: List[
+        Tuple[str, Callable[[], Union[LegacyCache, ExpirableCache]]]
+    ] = [
+        ('legacy', lambda: LegacyCache(expires=300.0)),
+        ('expirable', lambda: ExpirableCache(
+            expires=300.0, max_size=args.max_size,
+        )),
+        ('expirable (ttl 1ms)', lambda: ExpirableCache(
+            expires=0.001, max_size=args.max_size, purge_interval=0.01,
+        )),
+    ]
+    for operation in ('get', 'set', 'mixed'):
+        print(f'{operation}:')
+        for name, factory in caches:
+            for threads in args.threads:
+                cache = factory()
+                # half of the keys are present before gets
+                for key in range(0, args.keys, 2):
+                    cache.set(key, key)
+                elapsed = run(cache, operation, threads, args.ops, args.keys)
+                total = threads * args.ops
+                line = (
+                    f'{name:>20} x{threads:<2}: '
+                    f'{total / elapsed / 1e6:6.2f} Mops/s'
+                )
+                if isinstance(cache, ExpirableCache):
+                    stats = cache.stats()
+                    line += (
+                        f', size {stats["size"]}, hits {stats["hits"]}, '
+                        f'misses {stats["misses"]}, '
+                        f'evictions {stats["evictions"]}, '
+                        f'expirations {stats["expirations"]}'
+                    )
+                else:
+                    line += f', size {len(cache.cache_data)}'
+                print(line)
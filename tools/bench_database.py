@@ -0,0 +1,62 @@
+import argparse
+import os
+import tempfile
+import time
+
+from starrail.gacha.database import GachaDatabase
+from starrail.gacha.type import GachaType
+
+
+def make_entries(count: int):
+    for idx in range(count):
+        yield dict(
+            uid='100000001',
+            gacha_id='2003',
+            gacha_type=str(GachaType.CHARACTER.value),
+            item_id='20000',
+            count='1',
+            time='2023-05-10 12:00:00',
+            name='Arlan',
+            lang='en-us',
+            item_type='Character',
+            rank_type='4',
+            region='prod_gf_cn',
+            region_time_zone='8',
+            id=str(1683700000000000000 + idx),
+        )
+
+
+def insert_one_by_one(db: GachaDatabase, table: str, count: int):
+    for entry in make_entries(count):
+        db.add_entry(table, entry)
+
+
+def insert_batched(db: GachaDatabase, table: str, count: int):
+    db.add_entries(table, make_entries(count))
+
+
+def benchmark(insert, count: int) -> float:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'bench.sqlite3')
+        with GachaDatabase(path) as db:
+            start = time.perf_counter()
+            insert(db, GachaType.CHARACTER.name, count)
+            elapsed = time.perf_counter() - start
+    return count / elapsed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Benchmark rows/sec of GachaDatabase inserts.',
+    )
+    parser.add_argument(
+        '--sizes', nargs='+', type=int, default=[1000, 10000, 100000],
+        help='Numbers of records to insert.',
+    )
+    args = parser.parse_args()
+
+    print(f'{"records":>10} {"add_entry":>16} {"add_entries":>16}')
+    for size in args.sizes:
+        before = benchmark(insert_one_by_one, size)
+        after = benchmark(insert_batched, size)
+        print(f'{size:>10} {before:>12.0f} r/s {after:>12.0f} r/s')
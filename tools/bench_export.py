@@ -0,0 +1,150 @@
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import starrail.gacha.fileio as fileio
+from starrail.gacha.parse import GachaDataManager, init_empty_gacha_record
+from starrail.gacha.type import GachaType
+
+
+class BenchManager(GachaDataManager):
+    """A manager filled with generated records instead of a cache."""
+
+    def load_cache(self, uid: str):
+        self.cache_path = os.devnull
+        return init_empty_gacha_record()
+
+
+def make_manager(count: int) -> BenchManager:
+    manager = BenchManager(uid='100000001')
+    for gacha_type in GachaType:
+        records = []
+        for idx in range(count // len(GachaType)):
+            records.append(dict(
+                uid='100000001',
+                gacha_id='2003',
+                gacha_type=str(gacha_type.value),
+                item_id=str(20000 + idx % 120),
+                count='1',
+                time=f'2023-{1 + idx % 12:02d}-10 12:{idx % 60:02d}:00',
+                name=f'Name {idx % 120}',
+                lang='en-us',
+                item_type=random.choice(['Character', 'Light Cone']),
+                rank_type=random.choices(['3', '4', '5'], [94, 5, 1])[0],
+                region='prod_gf_cn',
+                region_time_zone='8',
+                id=str(1683700000000000000 + idx * 10 + gacha_type.value),
+            ))
+        manager.add_records(gacha_type.value, records[::-1])
+    return manager
+
+
+def legacy_json(manager: GachaDataManager, output_path: str) -> None:
+    # builds the whole document before writing it, as done before
+    data_dict = dict()
+    for gacha_type in GachaType:
+        data_dict[gacha_type.name] = manager.gacha[gacha_type.value].tolist()
+    with open(output_path, 'w', encoding='utf-8') as fout:
+        json.dump(data_dict, fout, indent=2, ensure_ascii=False)
+
+
+def import_time(statement: str) -> float:
+    # measured in a fresh interpreter, so modules are not cached yet
+    code = (
+        'import time; start = time.perf_counter(); '
+        f'{statement}; print(time.perf_counter() - start)'
+    )
+    output = subprocess.check_output([sys.executable, '-c', code])
+    return float(output.decode().strip().splitlines()[-1])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Benchmark the throughput of the exporters.',
+    )
+    parser.add_argument(
+        '--records', type=int, default=100000,
+        help='Number of records of the simulated account.',
+    )
+    parser.add_argument(
+        '--repeat', type=int, default=3,
+        help='Number of runs of each exporter, the best one is reported.',
+    )
+    parser.add_argument(
+        '--pipeline-formats', nargs='+', type=str,
+        default=['csv', 'html', 'json', 'md', 'srgf'],
+        choices=list(fileio.export_hooks),
+        help='Formats exported at once to compare the export pipeline.',
+    )
+    args = parser.parse_args()
+
+    random.seed(0)
+    manager = make_manager(args.records)
+    total = sum(len(data_list) for data_list in manager.gacha.values())
+    exporters = [
+        ('json (json.dump)', legacy_json),
+        ('json', fileio.export_as_json),
+        ('json --compact', lambda m, p: fileio.export_as_json(m, p, True)),
+        ('srgf', fileio.export_as_srgf),
+        ('srgf --compact', lambda m, p: fileio.export_as_srgf(m, p, True)),
+        ('md', fileio.export_as_md),
+        ('html', fileio.export_as_html),
+        ('csv', fileio.export_as_csv),
+        ('csv (pandas)', lambda m, p: fileio.export_as_csv(m, p, 'pandas')),
+        ('xlsx', fileio.export_as_xlsx),
+        ('xlsx (pandas)', lambda m, p: fileio.export_as_xlsx(m, p, 'pandas')),
+    ]
+    try:
+        import pandas  # noqa: F401
+    except ImportError:
+        print('pandas is not installed, skipping the pandas backend')
+        exporters = [it for it in exporters if 'pandas' not in it[0]]
+    print(f'records: {total}')
+    for statement in ('import starrail.gacha.fileio', 'import pandas'):
+        try:
+            elapsed = import_time(statement)
+        except subprocess.CalledProcessError:
+            continue
+        print(f'{statement:>28}: {elapsed * 1000:8.1f} ms')
+    with tempfile.TemporaryDirectory() as tmpdir:
+        # the extension is required by the pandas excel writer
+        path = os.path.join(tmpdir, 'export.xlsx')
+        for name, exporter in exporters:
+            elapsed = float('inf')
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                exporter(manager, path)
+                elapsed = min(elapsed, time.perf_counter() - start)
+            size = os.path.getsize(path)
+            print(
+                f'{name:>18}: {elapsed * 1000:8.1f} ms, '
+                f'{total / elapsed:10.0f} records/s, '
+                f'{size / 2 ** 20 / elapsed:7.1f} MiB/s',
+            )
+
+        formats = args.pipeline_formats
+        pipelines = [
+            ('separate', lambda: [
+                fileio.export_hooks[format](manager, path)
+                for format in formats
+            ]),
+            ('pipeline', lambda: fileio.export_formats(
+                manager, formats, tmpdir,
+            )),
+            ('pipeline --parallel', lambda: fileio.export_formats(
+                manager, formats, tmpdir, parallel=True,
+            )),
+        ]
+        print(f'exporting {" ".join(formats)}:')
+        for name, pipeline in pipelines:
+            elapsed = float('inf')
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                pipeline()
+                elapsed = min(elapsed, time.perf_counter() - start)
+            print(f'{name:>20}: {elapsed * 1000:8.1f} ms')
@@ -0,0 +1,124 @@
+import argparse
+import subprocess
+import sys
+from typing import Any, Dict, List, Tuple
+
+# statements executed by the commands, the budgets are in milliseconds
+scenarios: Dict[str, Dict[str, Any]] = {
+    'hksr --help': dict(
+        statement=(
+            'import sys; sys.argv = ["hksr", "--help"]\n'
+            'from starrail.entry.cli import cli_entry\n'
+            'try:\n'
+            '    cli_entry()\n'
+            'except SystemExit:\n'
+            '    pass\n'
+        ),
+        budget=60,
+    ),
+    'hksr unlock': dict(
+        # the real command, with the unlock action and the network stubbed
+        statement=(
+            'import sys; sys.argv = ["hksr", "unlock", "--fps", "120"]\n'
+            'import starrail.unlock.service as unlock\n'
+            'import starrail.utils.auto_update as auto_update\n'
+            'unlock.unlock_fps = lambda fps, reset: None\n'
+            'auto_update.get_distribution = lambda cdn_type: (None, 0)\n'
+            'from starrail.entry.cli import cli_entry\n'
+            'cli_entry()\n'
+        ),
+        budget=200,
+        # the update check, enabled by default, downloads with requests
+        allowed=['requests'],
+    ),
+}
+# heavy dependencies that the scenarios above should not import, unless
+# they are allowed by the scenario
+forbidden = [
+    'Cryptodome', 'PySide6', 'openpyxl', 'pandas', 'prettytable', 'qrcode',
+    'requests',
+]
+
+
+def import_times(statement: str) -> List[Tuple[int, int, str]]:
+    """
+    Runs a statement in a fresh interpreter with `-X importtime`.
+
+    Returns:
+        List[Tuple[int, int, str]]: The self time (us), the cumulative time
+            (us) and the indented name of each imported module.
+    """
+
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        check=True,
+    )
+    records = []
+    for line in process.stderr.decode().splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_time, cumulative, name = line[len('import time:'):].split('|')
+        records.append((int(self_time), int(cumulative), name[1:]))
+    return records
+
+
+def total_time(records: List[Tuple[int, int, str]], baseline: set) -> int:
+    # top-level imports only, excluding the ones of interpreter startup
+    return sum(
+        cumulative for _, cumulative, name in records
+        if not name.startswith(' ') and name not in baseline
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Check the import time of CLI commands against budgets.',
+    )
+    parser.add_argument(
+        '--repeat', type=int, default=5,
+        help='Number of runs of each scenario, the best one is reported.',
+    )
+    parser.add_argument(
+        '--top', type=int, default=10,
+        help='Number of the slowest top-level imports to display.',
+    )
+    args = parser.parse_args()
+
+    baseline = {name for _, _, name in import_times('pass')}
+    failed = False
+    for scenario, config in scenarios.items():
+        runs = [
+            import_times(config['statement'])
+            for _ in range(max(args.repeat, 1))
+        ]
+        best_records = min(runs, key=lambda it: total_time(it, baseline))
+        best = total_time(best_records, baseline)
+        modules = {name.strip() for _, _, name in best_records}
+        loaded = sorted(
+            package for package in forbidden
+            if package not in config.get('allowed', [])
+            and any(
+                module == package or module.startswith(f'{package}.')
+                for module in modules
+            )
+        )
+        within = best / 1000 <= config['budget'] and not loaded
+        failed = failed or not within
+        print(
+            f'{scenario}: {best / 1000:.1f} ms '
+            f'(budget {config["budget"]} ms) '
+            f'{"OK" if within else "FAILED"}',
+        )
+        if loaded:
+            print(f'  unexpected imports: {", ".join(loaded)}')
+        slowest: Dict[str, int] = {
+            name: cumulative for _, cumulative, name in best_records
+            if not name.startswith(' ') and name not in baseline
+        }
+        for name, cumulative in sorted(
+            slowest.items(), key=lambda it: it[1], reverse=True,
+        )[:args.top]:
+            print(f'  {cumulative / 1000:8.1f} ms  {name}')
+    sys.exit(1 if failed else 0)
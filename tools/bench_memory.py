@@ -0,0 +1,87 @@
+import argparse
+import copy
+import gc
+import random
+import time
+import tracemalloc
+
+from starrail.gacha.parse import GachaDataList, StringPool
+
+
+class LegacyGachaDataList:
+    """List of record dicts plus a set of ids, the layout used before the
+    columnar storage, kept here as the baseline."""
+
+    def __init__(self, name, iterable=()):
+        self.name = name
+        self.data = []
+        self.hash = set()
+        for item in iterable:
+            if item['id'] not in self.hash:
+                self.data.append(item)
+                self.hash.add(item['id'])
+
+    def tolist(self):
+        return copy.deepcopy(self.data)
+
+
+def make_records(count: int):
+    # mimics json.loads, which creates distinct string objects per record
+    names = [f'Name {idx}' for idx in range(120)]
+    for idx in range(count):
+        rank_type = random.choices(['3', '4', '5'], [94, 5, 1])[0]
+        yield {
+            'uid': ''.join(['100000001']),
+            'gacha_id': ''.join(['2003']),
+            'gacha_type': ''.join(['11']),
+            'item_id': str(20000 + idx % 120),
+            'count': ''.join(['1']),
+            'time': f'2023-{1 + idx % 12:02d}-10 12:{idx % 60:02d}:00',
+            'name': ''.join([random.choice(names)]),
+            'lang': ''.join(['zh-cn']),
+            'item_type': ''.join(['角色']),
+            'rank_type': rank_type,
+            'region': ''.join(['prod_gf_cn']),
+            'region_time_zone': ''.join(['8']),
+            'id': str(1683700000000000000 + count - idx),  # newest first
+        }
+
+
+def measure(factory, count: int):
+    gc.collect()
+    tracemalloc.start()
+    data_list = factory('CHARACTER', make_records(count))
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    start = time.perf_counter()
+    data_list.tolist()
+    elapsed = time.perf_counter() - start
+    return size, elapsed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Benchmark memory and tolist() cost of GachaDataList.',
+    )
+    parser.add_argument(
+        '--records', type=int, default=50000,
+        help='Number of records of the simulated account.',
+    )
+    args = parser.parse_args()
+
+    random.seed(0)
+    legacy_size, legacy_time = measure(LegacyGachaDataList, args.records)
+    random.seed(0)
+    columnar_size, columnar_time = measure(
+        lambda name, it: GachaDataList(name, it, strings=StringPool()),
+        args.records,
+    )
+    print(f'records:  {args.records}')
+    print(
+        f'legacy:   {legacy_size / 2 ** 20:8.2f} MiB, '
+        f'tolist {legacy_time * 1000:8.1f} ms',
+    )
+    print(
+        f'columnar: {columnar_size / 2 ** 20:8.2f} MiB, '
+        f'tolist {columnar_time * 1000:8.1f} ms',
+    )